@@ -0,0 +1,7 @@
+"""Benchmarks of flai.
+
+    suite : SeatSmart hot path benchmarks with JSON results and baseline
+        comparison (python -m benchmarks.suite --help)
+    isolation : isolation feature against the previous implementation
+    determinism : thread pool vector env against a sequential run
+"""
@@ -0,0 +1,60 @@
+"""Times the thread pool vector env (ThreadVectorSeatSmartEnv) against
+a sequential run with the same seed and checks that the results match
+(the check also runs in tests/test_thread_env.py).
+
+Usage:
+    python -m benchmarks.determinism
+"""
+import time
+
+import numpy as np
+
+from flai.envs.seatsmart_thread_env import ThreadVectorSeatSmartEnv
+
+
+def rollout(num_threads, num_envs=8, steps=500, seed=0):
+    """Steps a seeded env with random actions.
+
+    Returns:
+        tuple: (observations, rewards, dones, scores) of every step and
+            the elapsed time in seconds
+    """
+    env = ThreadVectorSeatSmartEnv(num_envs=num_envs, num_threads=num_threads)
+    env.seed(seed)
+    env.reset()
+    trace = []
+    start = time.perf_counter()
+    for _ in range(steps):
+        observation, reward, done, info = env.step(env.sample_actions())
+        trace.append(({key: value.copy() for key, value in observation.items()},
+                      reward, done, [i.get('Score') for i in info]))
+    elapsed = time.perf_counter() - start
+    env.close()
+    return trace, elapsed
+
+
+def assert_same(expected, actual):
+    assert len(expected) == len(actual)
+    for step, (a, b) in enumerate(zip(expected, actual)):
+        for key in a[0]:
+            assert np.array_equal(a[0][key], b[0][key]), \
+                'Observation {} differs at step {}'.format(key, step)
+        assert np.array_equal(a[1], b[1]), 'Rewards differ at step {}'.format(step)
+        assert np.array_equal(a[2], b[2]), 'Dones differ at step {}'.format(step)
+        assert a[3] == b[3], 'Scores differ at step {}'.format(step)
+
+
+def main(num_envs=8, steps=500, threads=(1, 2, 4)):
+    sequential, elapsed = rollout(0, num_envs, steps)
+    print('{:>10} {:>14}'.format('threads', 'steps/s'))
+    print('{:>10} {:>14.1f}'.format(
+        'sequential', num_envs*steps/elapsed))
+    for num_threads in threads:
+        trace, elapsed = rollout(num_threads, num_envs, steps)
+        assert_same(sequential, trace)
+        print('{:>10} {:>14.1f}'.format(num_threads, num_envs*steps/elapsed))
+    print('Thread pool results match the sequential run')
+
+
+if __name__ == '__main__':
+    main()
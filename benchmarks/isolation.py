@@ -0,0 +1,55 @@
+"""Benchmark of the isolation feature (SeatCustomer_MNL._dist_from_edge)
+against the previous cdist based implementation.
+
+Usage:
+    python -m benchmarks.isolation
+"""
+import timeit
+
+import numpy as np
+from scipy.ndimage import binary_erosion
+from scipy.spatial.distance import cdist
+
+from flai.envs.seatsmart.customer import SeatCustomer_MNL
+
+SEATMAPS = [(30, 6), (60, 10), (100, 12)]
+
+
+def dist_from_edge_cdist(img):
+    """Previous O(n^2) implementation, kept as the reference."""
+    interior = binary_erosion(img, border_value=1)
+    C = img - interior
+    out = C.astype(int)
+    try:
+        out[interior] = cdist(np.argwhere(C), np.argwhere(
+            interior), 'cityblock').min(0) + 1
+        return out / np.max(out)
+    except ValueError:
+        return out
+
+
+def availability(rows, cols, occupancy, seed=0):
+    """Random availability matrix with the given share of sold seats."""
+    rng = np.random.default_rng(seed)
+    return (rng.random((rows, cols)) >= occupancy).astype(float)
+
+
+def main(number=20, occupancy=0.1):
+    customer = SeatCustomer_MNL()
+    print('{:>10} {:>12} {:>12} {:>8}'.format(
+        'seatmap', 'cdist (ms)', 'cdt (ms)', 'speedup'))
+    for rows, cols in SEATMAPS:
+        img = availability(rows, cols, occupancy)
+        assert np.array_equal(dist_from_edge_cdist(img),
+                              customer._dist_from_edge(img))
+
+        old = timeit.timeit(lambda: dist_from_edge_cdist(img),
+                            number=number) / number
+        new = timeit.timeit(lambda: customer._dist_from_edge(img),
+                            number=number) / number
+        print('{:>10} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(
+            '{}x{}'.format(rows, cols), old*1e3, new*1e3, old/new))
+
+
+if __name__ == '__main__':
+    main()
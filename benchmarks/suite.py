@@ -0,0 +1,320 @@
+"""Micro and macro benchmarks of the SeatSmart hot paths over synthetic
+seat maps and customer type counts. Results are stored as JSON and can
+be compared against a saved baseline.
+
+Cases:
+    reset, step, episode : SeatSmartEnv (validate on and off)
+    generate : EventCreator.generate (Demand = seats of the seat map)
+    action : SeatCustomer_MNL.action on a 10% occupied flight
+    count_seats, products : Flight._count_seats / Flight.__call__
+        (products list rebuilt from the ledger)
+    sample : ActionSpace.sample
+
+Usage:
+    python -m benchmarks.suite run -o baseline.json
+    python -m benchmarks.suite run -o current.json --filter step
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.1
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import yaml
+
+from flai.envs.seatsmart_env import SeatSmartEnv, ActionSpace
+from flai.envs.seatsmart.game import PricingGame
+from flai.envs.seatsmart.event import EventCreator
+from flai.envs.seatsmart.customer import SeatCustomer_MNL, default_configuration
+from flai.envs.seatsmart.models import customer
+from flai.envs.seatsmart.models.event import EventState
+from flai.utils import make_rng
+
+SEATMAPS = [(30, 6), (60, 10), (100, 12)]
+CUSTOMER_TYPES = [1, 2, 8]
+SEED = 0
+
+
+def seatmap_config(rows, cols):
+    """Game config of a synthetic single aisle (up to 6 columns) or twin
+    aisle seat map with an upfront, an exit row and a standard zone."""
+    if cols <= 6:
+        aisles = [cols // 2 - 1, cols // 2]
+    else:
+        left = round(cols * 0.3)
+        aisles = [left - 1, left, cols - left - 1, cols - left]
+    upfront = list(range(1, max(2, rows // 10)))
+    exits = [0, rows // 2]
+    return {'SeatMap': {
+        'MaxRows': rows,
+        'MaxCols': cols,
+        'Zones': [
+            {'Name': 'StandardSeat',
+             'PriceRule': {'Price': 10, 'MinPrice': 0, 'MaxPrice': 15}},
+            {'Name': 'UpfrontSeat', 'IncludeRows': upfront,
+             'PriceRule': {'Price': 15, 'MinPrice': 10, 'MaxPrice': 25}},
+            {'Name': 'ExitSeat', 'IncludeRows': exits,
+             'PriceRule': {'Price': 25, 'MinPrice': 20, 'MaxPrice': 40}},
+        ],
+        'WindowCols': [0, cols - 1],
+        'AisleCols': aisles,
+        'ExitRows': exits,
+    }}
+
+
+def customer_types(n):
+    """n customer types alternating the default Regular and Business
+    parameters, with equal spawn probabilities (n is a power of 2 so
+    that they sum to exactly 1)."""
+    base = default_configuration().CustomerTypes
+    return [customer.CustomerType(**dict(base[i % len(base)].dict(),
+                                         Name='Type{}'.format(i),
+                                         SpawnProba=1 / n))
+            for i in range(n)]
+
+
+def occupied_game(config, occupancy=0.1, validate=True):
+    """Seeded game with `occupancy` of its seats sold"""
+    game = PricingGame(config=config, seed=SEED, validate=validate)
+    rng = make_rng(SEED)
+    seats = np.argwhere(game.flight.grid.available)
+    sold = rng.choice(len(seats), size=int(len(seats) * occupancy), replace=False)
+    for row, col in seats[sold].tolist():
+        game.flight.sell_seat(row, col)
+    return game
+
+
+class Workdir:
+    """Writes the game configs of the env cases to yaml files"""
+
+    def __init__(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def config_path(self, config):
+        path = os.path.join(self.directory.name, '{}x{}.yaml'.format(
+            config['SeatMap']['MaxRows'], config['SeatMap']['MaxCols']))
+        with open(path, 'w') as f:
+            yaml.safe_dump(config, f)
+        return path
+
+
+def make_env(workdir, config, validate):
+    env = SeatSmartEnv(config_path=workdir.config_path(config), validate=validate)
+    env.seed(SEED)
+    env.reset()
+    return env
+
+
+def mid_prices(zone_price):
+    return {key: (value['MinPrice'] + value['MaxPrice']) / 2
+            for key, value in zone_price.items()}
+
+
+def case_reset(workdir, config, validate):
+    env = make_env(workdir, config, validate)
+    return env.reset, 5
+
+
+def case_step(workdir, config, validate):
+    env = make_env(workdir, config, validate)
+    action = mid_prices(env.game.flight.zone_price)
+
+    def step():
+        # Episodes are reset when they end
+        if env.step(action)[2]:
+            env.reset()
+    return step, 100
+
+
+def case_episode(workdir, config, validate):
+    env = make_env(workdir, config, validate)
+    action = mid_prices(env.game.flight.zone_price)
+
+    def episode():
+        env.reset()
+        while not env.step(action)[2]:
+            pass
+    return episode, 1
+
+
+def case_generate(config, types):
+    customer_types_ = customer_types(types)
+    demand = config['SeatMap']['MaxRows'] * config['SeatMap']['MaxCols']
+    creator = EventCreator(EventState(Demand=demand, CustomerTypes=customer_types_),
+                           rng=make_rng(SEED))
+    return lambda: creator.generate(customer_types_), 20
+
+
+def case_action(config, types):
+    game = occupied_game(config)
+    customer_types_ = customer_types(types)
+    seat_customer = SeatCustomer_MNL(config=customer.Configuration(CustomerTypes=customer_types_),
+                                     rng=make_rng(SEED))
+    seat_customer.spawn(customer.SpawnInfo(Time=datetime.datetime(2020, 6, 1),
+                                           CustomerTypeName=customer_types_[-1].Name))
+    observation = game.customer_observation
+    features = game.flight.features
+    return lambda: seat_customer.action(observation, features=features), 50
+
+
+def case_count_seats(config):
+    flight = occupied_game(config).flight
+    return lambda: flight._count_seats(flight.state), 200
+
+
+def case_products(config):
+    flight = occupied_game(config).flight
+
+    def products():
+        flight._products = None
+        return flight()
+    return products, 200
+
+
+def case_sample(config):
+    game = PricingGame(config=config, seed=SEED)
+    space = ActionSpace(game.flight.zone_price, rng=make_rng(SEED))
+    return space.sample, 1000
+
+
+def cases(workdir):
+    """(name, params, setup) of every benchmark of the matrix. setup()
+    returns the timed callable and its number of calls per repeat."""
+    for rows, cols in SEATMAPS:
+        config = seatmap_config(rows, cols)
+        seatmap = '{}x{}'.format(rows, cols)
+        for validate in (True, False):
+            params = {'seatmap': seatmap, 'validate': validate}
+            for name, setup in (('reset', case_reset), ('step', case_step),
+                                ('episode', case_episode)):
+                yield name, params, (lambda setup=setup, validate=validate, config=config:
+                                     setup(workdir, config, validate))
+        for types in CUSTOMER_TYPES:
+            params = {'seatmap': seatmap, 'types': types}
+            yield 'generate', params, (lambda config=config, types=types:
+                                       case_generate(config, types))
+            yield 'action', params, (lambda config=config, types=types:
+                                     case_action(config, types))
+        params = {'seatmap': seatmap}
+        for name, setup in (('count_seats', case_count_seats), ('products', case_products),
+                            ('sample', case_sample)):
+            yield name, params, (lambda setup=setup, config=config: setup(config))
+
+
+def key(result):
+    """Identifier of a benchmark, e.g. step[seatmap=30x6,validate=True]"""
+    params = ','.join('{}={}'.format(k, v) for k, v in sorted(result['params'].items()))
+    return '{}[{}]'.format(result['case'], params)
+
+
+def run(repeat=5, scale=1., pattern=None):
+    """Runs the benchmarks.
+
+    Args:
+        repeat (int) : timed repeats of every benchmark
+        scale (float) : multiplier of the number of calls per repeat
+        pattern (str) : only run the benchmarks whose key contains it
+
+    Returns:
+        dict: {'meta': environment, 'results': [...]} where every result
+            holds the best and the median time per call in seconds
+    """
+    workdir = Workdir()
+    results = []
+    for name, params, setup in cases(workdir):
+        result = {'case': name, 'params': dict(params)}
+        if pattern is not None and pattern not in key(result):
+            continue
+        func, number = setup()
+        number = max(1, int(number * scale))
+        func()  # warm up (caches, lazy imports)
+        times = [t / number for t in timeit.repeat(func, number=number, repeat=repeat)]
+        result.update(number=number, repeat=repeat,
+                      best=min(times), median=statistics.median(times))
+        results.append(result)
+        print('{:<48} {:>12.1f} us {:>12.1f} us'.format(
+            key(result), result['best'] * 1e6, result['median'] * 1e6))
+    return {'meta': {'created': datetime.datetime.now().isoformat(),
+                     'python': sys.version.split()[0],
+                     'numpy': np.__version__,
+                     'platform': platform.platform(),
+                     'processor': platform.processor(),
+                     'repeat': repeat,
+                     'scale': scale},
+            'results': results}
+
+
+def compare(baseline, current, threshold=0.1):
+    """Compares the best times of two runs.
+
+    Args:
+        baseline (dict) : saved run
+        current (dict) : new run
+        threshold (float) : relative slow down flagged as a regression
+
+    Returns:
+        list: keys of the regressed benchmarks
+    """
+    base = {key(result): result for result in baseline['results']}
+    regressions = []
+    print('{:<48} {:>12} {:>12} {:>8}'.format('benchmark', 'baseline us', 'current us', 'ratio'))
+    for result in current['results']:
+        name = key(result)
+        if name not in base:
+            print('{:<48} {:>12} {:>12.1f} {:>8}'.format(name, '-', result['best'] * 1e6, 'new'))
+            continue
+        ratio = result['best'] / base[name]['best']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = ' REGRESSION'
+            regressions.append(name)
+        print('{:<48} {:>12.1f} {:>12.1f} {:>7.2f}x{}'.format(
+            name, base[name]['best'] * 1e6, result['best'] * 1e6, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SeatSmart benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', '--output', help='JSON results file')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--scale', type=float, default=1.,
+                            help='multiplier of the calls per repeat')
+    run_parser.add_argument('--filter', dest='pattern',
+                            help='only run the benchmarks whose key contains it')
+
+    compare_parser = commands.add_parser('compare', help='compare two runs')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative slow down flagged as a regression')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        results = run(repeat=args.repeat, scale=args.scale, pattern=args.pattern)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, threshold=args.threshold)
+    if regressions:
+        print('{} regression(s) above {:.0%}'.format(len(regressions), args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
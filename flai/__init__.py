@@ -1,5 +1,6 @@
-from flai.core import Env, ObservationSpace, ActionSpace
-from flai.envs import SeatSmartEnv
+from flai.core import Env, ObservationSpace, ActionSpace, Box
+from flai.envs import (SeatSmartEnv, VectorSeatSmartEnv, SubprocVectorSeatSmartEnv,
+                       ThreadVectorSeatSmartEnv, AsyncVectorSeatSmartEnv)
 # from flai.interactive.seatsmart import game
 # __all__ = ["Env", "game"]
 
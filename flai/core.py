@@ -158,6 +158,67 @@ class ObservationSpace(object):
         return json.dumps(info)
 
 
+class Box(object):
+    """Typed observation space of fixed shape arrays. Every element
+    lies in [low, high] (bounds are broadcast to the shape).
+    The main API methods that users of this class need to know are:
+        zeros
+        sample
+
+    Example Usage:
+        [1]space = Box(low=0, high=1, shape=(3, 2), dtype=np.float32)
+        [2]buffer = space.zeros()
+        [3]buffer in space
+        >>> True
+        [4]print(space)
+        >>> {"shape": [3, 2], "dtype": "float32"}
+    """
+
+    def __init__(self, low=-math.inf, high=math.inf, shape=None, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape) if shape is not None else np.shape(low)
+        self.low = np.broadcast_to(
+            np.asarray(low, dtype=self.dtype), self.shape)
+        self.high = np.broadcast_to(
+            np.asarray(high, dtype=self.dtype), self.shape)
+
+        assert (self.high >= self.low).all(), 'lower limit is greater than upper limit'
+
+    def zeros(self):
+        """Allocates an array of the space (e.g. a preallocated
+        observation buffer)"""
+        return np.zeros(self.shape, dtype=self.dtype)
+
+    def sample(self, rng=None):
+        """Sample an array from the space. Bounded axes are sampled
+        uniformly and unbounded ones around their finite bound.
+
+        Args:
+            rng (np.random.Generator) : Generator to draw from
+                (default: np_random.rng)
+        """
+        rng = np_random.rng if rng is None else rng
+        low = np.where(np.isfinite(self.low), self.low, -1.)
+        high = np.where(np.isfinite(self.high), self.high, low + 1.)
+        x = rng.uniform(low, high)
+        x = np.where(np.isfinite(self.high), x, x + np.abs(rng.normal(size=self.shape)))
+        return np.clip(x, self.low, self.high).astype(self.dtype)
+
+    def __contains__(self, x):
+        """To check if the array is present in the
+        observation space.
+        """
+        x = np.asarray(x)
+        return (x.shape == self.shape) and (x.dtype == self.dtype) and \
+            bool((x >= self.low).all()) and bool((x <= self.high).all())
+
+    def __repr__(self):
+        """To represent the space as json with its
+        shape and dtype
+        """
+        return json.dumps({'shape': list(self.shape), 'dtype': self.dtype.name})
+
+
 class ActionSpace(object):
     """The main Action Space class. It encapsulates an action space
     with arbitrary behind-the-scenes dynamics. This action space is
@@ -217,7 +278,7 @@ class ActionSpace(object):
             high = self.upper[i]
 
             # random sample
-            price = np_random.rng.randint(low=low, high=high)
+            price = np_random.rng.integers(low=low, high=high)
             result.append(price)
 
             # update the lower limit for next round of sampling
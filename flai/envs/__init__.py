@@ -1,2 +1,5 @@
 from flai.envs.seatsmart_env import SeatSmartEnv
-
+from flai.envs.seatsmart_vector_env import VectorSeatSmartEnv
+from flai.envs.seatsmart_subproc_env import SubprocVectorSeatSmartEnv
+from flai.envs.seatsmart_thread_env import ThreadVectorSeatSmartEnv
+from flai.envs.seatsmart_async_env import AsyncVectorSeatSmartEnv
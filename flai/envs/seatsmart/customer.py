@@ -1,4 +1,6 @@
+import copy
 import datetime
+from functools import partial
 from flai.envs.seatsmart.models import customer
 
 from flai.utils import np_random
@@ -6,8 +8,9 @@ from flai.utils import np_random
 from abc import ABC, abstractmethod
 
 import numpy as np
-from scipy.ndimage.morphology import binary_erosion, binary_opening
-from scipy.spatial.distance import cdist
+from scipy.ndimage import binary_erosion, binary_opening, distance_transform_cdt
+
+from flai.envs.seatsmart.features import edge_distance, scan_groupseats
 
 
 class BaseCustomer(ABC):
@@ -89,45 +92,96 @@ class BaseCustomer(ABC):
         """
 
 
+class ParameterTable:
+    """Parameters of the SeatCustomer_MNL customer types compiled once.
+    `types` holds the validated parameters (customer.MNLParameters) of
+    every customer type and the betas are also stored as arrays with
+    one entry per customer type, so that customers of different types
+    can be evaluated together. beta_group_seat is padded with zeros to
+    the longest list.
+
+    Example :
+        table = ParameterTable(config.CustomerTypes)
+        table.types[type_index].beta_window
+        table.beta_window[type_index]
+    """
+
+    SCALARS = ('beta_price_sensitivity', 'beta_nobuy_sensitivity',
+               'beta_forward', 'beta_window', 'beta_aisle',
+               'beta_extra_legroom', 'beta_isolation', 'beta_constant')
+
+    def __init__(self, customer_types):
+        self.names = [c.Name for c in customer_types]
+        self.types = [customer.MNLParameters(**c.Parameters)
+                      for c in customer_types]
+        for key in self.SCALARS:
+            setattr(self, key, np.array(
+                [getattr(p, key) for p in self.types], dtype=np.float64))
+
+        group_seat = [p.beta_group_seat for p in self.types]
+        self.beta_group_seat = np.zeros(
+            (len(group_seat), max(len(g) for g in group_seat)), dtype=np.float64)
+        for i, g in enumerate(group_seat):
+            self.beta_group_seat[i, :len(g)] = g
+
+
+def default_configuration():
+    """Default customer configuration (a Regular and a Business
+    customer type). A new object is built for every customer model so
+    that models never share mutable parameters."""
+    return customer.Configuration(
+        CustomerTypes=[
+            customer.CustomerType(
+                Name="Regular", SpawnProba=0.8, ArrivalAlpha=1.5, ArrivalBeta=2.5,
+                Parameters={
+                    "beta_group_seat": [0, 0.3, 0.2, 0.1],
+                    "beta_price_sensitivity": -0.01,
+                    "beta_nobuy_sensitivity": 0.03,
+                    "beta_forward": 1.5,
+                    "beta_window": 0.75,
+                    "beta_aisle": 0.5,
+                    "beta_extra_legroom": 0.75,
+                    "beta_isolation": 0.75,
+                    "beta_constant": 1.4,
+                    "groupsize_probability": [0.5, 0.5],
+                }
+            ),
+            customer.CustomerType(
+                Name="Business", SpawnProba=0.2, ArrivalAlpha=8, ArrivalBeta=1.2,
+                Parameters={
+                    "beta_group_seat": [0, 0.3, 0.2, 0.1],
+                    "beta_price_sensitivity": -0.01,
+                    "beta_nobuy_sensitivity": 0.03,
+                    "beta_forward": 1.5,
+                    "beta_window": 0.75,
+                    "beta_aisle": 0.5,
+                    "beta_extra_legroom": 0.75,
+                    "beta_isolation": 0.75,
+                    "beta_constant": 1.4,
+                    "groupsize_probability": [0.5, 0.5],
+                }
+            )
+        ]
+    )
+
+
 class SeatCustomer_MNL(BaseCustomer):
     """Customer Choice Model with seat preference
+
+    Args:
+        config (Configuration) : customer types (default:
+            default_configuration())
+        rng (Generator) : random state of the seat choices
+            (default: np_random.rng)
+        validate (bool) : validate the spawn contexts and actions
+            (see PricingGame)
     """
 
-    def __init__(self,
-                 config=customer.Configuration(
-                     CustomerTypes=[
-                         customer.CustomerType(
-                             Name="Regular", SpawnProba=0.8, ArrivalAlpha=1.5, ArrivalBeta=2.5,
-                             Parameters={
-                                 "beta_group_seat": [0, 0.3, 0.2, 0.1],
-                                 "beta_price_sensitivity": -0.01,
-                                 "beta_nobuy_sensitivity": 0.03,
-                                 "beta_forward": 1.5,
-                                 "beta_window": 0.75,
-                                 "beta_aisle": 0.5,
-                                 "beta_extra_legroom": 0.75,
-                                 "beta_isolation": 0.75,
-                                 "beta_constant": 1.4,
-                                 "groupsize_probability": [0.5, 0.5],
-                             }
-                         ),
-                         customer.CustomerType(
-                             Name="Business", SpawnProba=0.2, ArrivalAlpha=8, ArrivalBeta=1.2,
-                             Parameters={
-                                 "beta_group_seat": [0, 0.3, 0.2, 0.1],
-                                 "beta_price_sensitivity": -0.01,
-                                 "beta_nobuy_sensitivity": 0.03,
-                                 "beta_forward": 1.5,
-                                 "beta_window": 0.75,
-                                 "beta_aisle": 0.5,
-                                 "beta_extra_legroom": 0.75,
-                                 "beta_isolation": 0.75,
-                                 "beta_constant": 1.4,
-                                 "groupsize_probability": [0.5, 0.5],
-                             }
-                         )
-                     ]
-                 )):
+    def __init__(self, config=None, rng=None, validate=True):
+        if config is None:
+            config = default_configuration()
+        self.rng = np_random.rng if rng is None else rng
+        self.validate = validate
 
         # build customer_type
         self._type_list = config.CustomerTypes
@@ -140,28 +194,99 @@ class SeatCustomer_MNL(BaseCustomer):
 
         self._spawn_context = None
         self._publish = self.publish(CustomerTypes=config.CustomerTypes)
+        self._parameter_table = None
+        self._static_preference = {}
+
+    def fork(self, rng=None, validate=None):
+        """New customer model of the same customer types. The customer
+        types, the parameter table and the static preferences are shared
+        with this model, only the random state and the spawned customer
+        are its own.
+
+        Args:
+            rng (Generator) : random state of the seat choices
+                (default: np_random.rng)
+            validate (bool) : validate flag (default: the flag of this model)
+
+        Returns:
+            SeatCustomer_MNL
+        """
+        table = self.parameter_table
+        forked = copy.copy(self)
+        forked.rng = np_random.rng if rng is None else rng
+        forked.validate = self.validate if validate is None else validate
+        forked._spawn_context = None
+        forked._parameter_table = table
+        return forked
+
+    @property
+    def parameter_table(self):
+        """Parameters of all the customer types (ParameterTable)"""
+        if self._parameter_table is None:
+            self._parameter_table = ParameterTable(self._type_list)
+        return self._parameter_table
+
+    def static_preference(self, rows, cols, window_cols, aisle_cols, exit_rows):
+        """Utility terms that only depend on the seat map: constant,
+        window, aisle, exit row and forward preferences. They are
+        computed once per seat map for all the customer types.
+
+        Returns:
+            np.array: (n_types, rows, cols) read only utilities
+        """
+        key = (rows, cols, tuple(window_cols),
+               tuple(aisle_cols), tuple(exit_rows))
+        if key not in self._static_preference:
+            table = self.parameter_table
+
+            def beta(name):
+                return getattr(table, name)[:, None, None]
+
+            # Add a constant utility value
+            preference = np.zeros(shape=(len(table.types), rows, cols))
+            preference += beta('beta_constant')
+
+            # Preference for window seats
+            preference[:, :, list(window_cols)] += beta('beta_window')
+
+            # Preference for aisle seats
+            preference[:, :, list(aisle_cols)] += beta('beta_aisle')
+
+            # Preference for exit row (or extra legroom) seats
+            preference[:, list(exit_rows), :] += beta('beta_extra_legroom')
+
+            # Preference for forwarward seats
+            preference += np.linspace(1, 0, rows)[None, :, None] * \
+                beta('beta_forward')
+
+            preference.flags.writeable = False
+            self._static_preference[key] = preference
+        return self._static_preference[key]
 
     def spawn(self, spawn_info, seed=None):
-        self.customer = self._type_list[self._name_to_index[spawn_info.CustomerTypeName]]
+        self._type_index = self._name_to_index[spawn_info.CustomerTypeName]
+        self.customer = self._type_list[self._type_index]
         # self.groupsize = np_random.rng.choice(
         #     [1, 2], p=self.customer.Parameters['groupsize_probability'])
         self.groupsize = 1
-        self._spawn_context = self.spawn_context(GroupSize=self.groupsize)
+        if self.validate:
+            self._spawn_context = self.spawn_context(GroupSize=self.groupsize)
+        else:
+            self._spawn_context = self.spawn_context.construct(
+                GroupSize=self.groupsize)
         return self._spawn_context
 
     def _dist_from_edge(self, img):
-        """Calculate the distance to nearest occupied seat."""
-        interior = binary_erosion(img, border_value=1)  # Interior mask
-        C = img - interior              # Contour mask
-        # Setup o/p and assign cityblock distances
-        out = C.astype(int)
+        """Calculate the distance to nearest occupied seat.
 
-        try:
-            out[interior] = cdist(np.argwhere(C), np.argwhere(
-                interior), 'cityblock').min(0) + 1
-            return out / np.max(out)
-        except:
+        Every available seat gets its cityblock distance to the contour
+        of the available area (contour seats get 1) normalized by the
+        maximum (see features.edge_distance).
+        """
+        out, has_contour = edge_distance(img)
+        if not has_contour:
             return out
+        return out / np.max(out)
 
     def _pick_preferred_seat(self, avail, preference, no_buy):
         avail_prob = np.ma.MaskedArray(preference, avail == 0).filled(0)
@@ -170,12 +295,12 @@ class SeatCustomer_MNL(BaseCustomer):
         top_N = np.argpartition(avail_prob, -self.choice_N)[-self.choice_N:]
         top_N_prob = avail_prob[top_N]
         top_N_prob /= np.sum(top_N_prob)
-        seat = top_N[np_random.rng.choice(top_N_prob.size, p=top_N_prob)]
+        seat = top_N[self.rng.choice(top_N_prob.size, p=top_N_prob)]
         if seat == len(avail_prob) - 1:
             return None
         else:
-            row = seat // 6
-            col = seat % 6
+            row = seat // avail.shape[1]
+            col = seat % avail.shape[1]
             return (row, col)
 
     def _scan_groupseats(self, img, size=1):
@@ -210,47 +335,52 @@ class SeatCustomer_MNL(BaseCustomer):
                                [0, 0, 0, 0, 0, 0, 0],
                                [0, 0, 0, 0, 0, 0, 0]])
         """
-        structure = np.ones((1, size))
-        return binary_opening(img, structure=structure).astype(img.dtype)
+        return scan_groupseats(img, size)
+
+    def action(self, observations, features=None):
+        """Seat selection of the spawned customer.
 
-    def action(self, observations):
+        Args:
+            observations (customer.Observation) : seat map and prices
+            features (SeatFeatures) : incrementally maintained features
+                of the flight. Used instead of recomputing the isolation
+                and group seat features when they describe the same
+                availability as the observation.
+
+        Returns:
+            customer.Action
+        """
 
         seat_prices_matrix = np.array(observations.Seats)
         seat_availability_matrix = np.zeros_like(seat_prices_matrix)
         seat_availability_matrix[seat_prices_matrix > 0] = 1
 
         rows, cols = seat_availability_matrix.shape
-
-        # Intialize with zeros
-        preference = np.zeros(shape=(rows, cols))
-
-        # Add a constant utility value
-        preference += self.customer.Parameters['beta_constant']
+        parameters = self.parameter_table.types[self._type_index]
+
+        # Seat map only utilities (constant, window, aisle, exit rows
+        # and forward seats)
+        preference = self.static_preference(rows, cols,
+                                            observations.WindowCols,
+                                            observations.AisleCols,
+                                            observations.ExitRows)[self._type_index].copy()
+
+        if (features is not None) and features.matches(seat_availability_matrix):
+            isolation = features.isolation
+            groupseats = features.group_seats
+        else:
+            isolation = partial(self._dist_from_edge,
+                                seat_availability_matrix)
+            groupseats = partial(self._scan_groupseats,
+                                 seat_availability_matrix)
 
         # Set customers opinion of the seat prices based on customer
         # characteristics. People prefer seats next to empty seats
-        preference += self.customer.Parameters['beta_isolation'] * \
-            self._dist_from_edge(seat_availability_matrix)
-
-        # Preference for window seats
-        preference[:, observations.WindowCols] += self.customer.Parameters['beta_window']
-
-        # Preference for aisle seats
-        preference[:, observations.AisleCols
-                   ] += self.customer.Parameters['beta_aisle']
+        preference += parameters.beta_isolation * isolation()
 
-        # Preference for exit row (or extra legroom) seats
-        preference[observations.ExitRows
-                   ] += self.customer.Parameters['beta_extra_legroom']
-
-        # Preference for forwarward seats
-        preference += np.tile(np.linspace(1, 0, rows),
-                              (cols, 1)).T * self.customer.Parameters['beta_forward']
-
-        for size, beta in enumerate(self.customer.Parameters['beta_group_seat']):
+        for size, beta in enumerate(parameters.beta_group_seat):
             if size > 0:
-                preference += beta * self._scan_groupseats(
-                    seat_availability_matrix, size+1)
+                preference += beta * groupseats(size+1)
 
         temp_ma = np.ma.MaskedArray(
             preference, seat_availability_matrix == 0).filled(0)
@@ -265,12 +395,12 @@ class SeatCustomer_MNL(BaseCustomer):
             worst_choice_price = 0
 
         worst_choice += worst_choice_price * \
-            self.customer.Parameters['beta_nobuy_sensitivity']
+            parameters.beta_nobuy_sensitivity
 
         # Preference for less expensive seats
         preference += np.clip(seat_prices_matrix
                               - worst_choice_price,
-                              a_min=0, a_max=None) * self.customer.Parameters['beta_price_sensitivity']
+                              a_min=0, a_max=None) * parameters.beta_price_sensitivity
 
         # Exponential of all values
         preference = np.exp(preference)
@@ -288,8 +418,8 @@ class SeatCustomer_MNL(BaseCustomer):
         # Remove chances of selecting a taken seat and flatten
         seat_probs[taken_seats] = 0
 
-        action = self.action_space()
-        action.MetaInfo = [(np.ma.MaskedArray(
+        selected = []
+        meta_info = [(np.ma.MaskedArray(
             preference-nobuy_preference, seat_availability_matrix == 0).filled(0)).tolist()]
 
         if self.groupsize == 1:
@@ -297,7 +427,7 @@ class SeatCustomer_MNL(BaseCustomer):
             select = self._pick_preferred_seat(avail, preference,
                                                nobuy_preference)
             if not select is None:
-                action.Selected = [select]
+                selected = [select]
 
         else:  # self.groupsize == 2
             avail = self._scan_groupseats(
@@ -336,9 +466,155 @@ class SeatCustomer_MNL(BaseCustomer):
                     select_n = self._pick_preferred_seat(avail, preference,
                                                          nobuy_preference)
 
-                    action.Selected = [select, select_n]
+                    selected = [select, select_n]
+
+        if self.validate:
+            return self.action_space(Selected=selected, MetaInfo=meta_info)
+        return self.action_space.construct(
+            Selected=[(int(row), int(col)) for row, col in selected],
+            MetaInfo=meta_info)
+
+    def _batch_dist_from_edge(self, img):
+        """Batched version of `_dist_from_edge` for a (B, rows, cols)
+        stack of availability matrices. Every seat map is processed
+        independently.
+        """
+        # cityblock neighbourhood inside each seat map only
+        cross = np.zeros((3, 3, 3), dtype=bool)
+        cross[1] = [[0, 1, 0], [1, 1, 1], [0, 1, 0]]
+
+        interior = binary_erosion(img, structure=cross, border_value=1)
+        C = (img != 0) & ~interior
+        out = C.astype(int)
+
+        has_contour = C.any(axis=(1, 2))
+        if not has_contour.any():
+            return out
+
+        interior &= has_contour[:, None, None]
+        out[interior] = distance_transform_cdt(
+            interior, metric=cross)[interior] + 1
+
+        peak = np.max(out, axis=(1, 2))
+        return out / np.where(peak > 0, peak, 1)[:, None, None]
+
+    def batch_preference(self, seats, types, window_cols, aisle_cols, exit_rows,
+                         features=None):
+        """Utilities of all the seats and of the no-buy option for a batch
+        of customers. This is the computation of `action` for B customers
+        (one seat map each) at once.
+
+        Args:
+            seats (np.array) : (B, rows, cols) seat prices, same encoding
+                as customer.Observation.Seats (price if the seat is
+                available, -1 for ghost seats and 0 otherwise)
+            types (np.array) : (B,) customer type index of every customer
+            window_cols (list) : window columns
+            aisle_cols (list) : aisle columns
+            exit_rows (list) : exit rows
+            features (list) : optional SeatFeatures of every seat map, used
+                when they all describe the same availability as seats
+
+        Returns:
+            tuple: (B, rows, cols) seat utilities and (B,) no-buy utilities
+        """
+        table = self.parameter_table
+        seat_prices_matrix = np.asarray(seats, dtype=np.float64)
+        available = seat_prices_matrix > 0
+        seat_availability_matrix = available.astype(np.float64)
+
+        B, rows, cols = seat_prices_matrix.shape
+
+        def beta(key):
+            return getattr(table, key)[types][:, None, None]
+
+        incremental = (features is not None) and all(
+            f.matches(img) for f, img in zip(features, seat_availability_matrix))
+
+        preference = self.static_preference(rows, cols, window_cols,
+                                            aisle_cols, exit_rows)[types]
+        if incremental:
+            isolation = np.stack([f.isolation() for f in features])
+        else:
+            isolation = self._batch_dist_from_edge(seat_availability_matrix)
+        preference += beta('beta_isolation') * isolation
+
+        group_seat = table.beta_group_seat[types]
+        for size in range(1, group_seat.shape[1]):
+            if incremental:
+                groupseats = np.stack([f.group_seats(size+1)
+                                       for f in features])
+            else:
+                groupseats = binary_opening(seat_availability_matrix,
+                                            structure=np.ones((1, 1, size+1)))
+            preference += group_seat[:, size][:, None, None] * groupseats
+
+        # Utility of Worst Seat on plane, will be used for no-buy option
+        temp_ma = np.where(available, preference, 0)
+        has_choice = (temp_ma != 0).any(axis=(1, 2))
+        worst_choice = np.where(has_choice, np.min(
+            np.where(temp_ma != 0, temp_ma, np.inf), axis=(1, 2)), 0)
+        worst_choice_price = np.where(has_choice, np.min(
+            np.where(seat_prices_matrix != 0, seat_prices_matrix, np.inf), axis=(1, 2)), 0)
+
+        worst_choice += worst_choice_price * table.beta_nobuy_sensitivity[types]
+
+        # Preference for less expensive seats
+        preference += np.clip(seat_prices_matrix - worst_choice_price[:, None, None],
+                              a_min=0, a_max=None) * beta('beta_price_sensitivity')
+
+        return np.where(available, preference, -np.inf), worst_choice
+
+    def batch_action(self, seats, types, window_cols, aisle_cols, exit_rows,
+                     features=None, rngs=None):
+        """Seat selection of a batch of single seat customers. Like
+        `_pick_preferred_seat`, every customer picks among its top N
+        options (seats and no-buy) with probability proportional to the
+        exponential utility. The pick is done for all the customers at
+        once with the Gumbel-max trick.
+
+        Args:
+            seats (np.array) : (B, rows, cols) seat prices (see
+                `batch_preference`)
+            types (np.array) : (B,) customer type index or name of every
+                customer
+            window_cols (list) : window columns
+            aisle_cols (list) : aisle columns
+            exit_rows (list) : exit rows
+            features (list) : optional SeatFeatures of every seat map (see
+                `batch_preference`)
+            rngs (list) : optional Generator of every customer, so that the
+                pick of a customer does not depend on the rest of the batch
+                (default: draw the whole batch from `rng`)
+
+        Returns:
+            np.array: (B, 2) selected (row, col) per customer, (-1, -1)
+                for a no-buy
+        """
+        types = np.array([self._name_to_index[t] if isinstance(t, str) else t
+                          for t in types], dtype=np.intp)
+        preference, nobuy = self.batch_preference(
+            seats, types, window_cols, aisle_cols, exit_rows, features)
+
+        B, rows, cols = preference.shape
+        utility = np.concatenate(
+            (preference.reshape(B, -1), nobuy[:, None]), axis=1)
+
+        # top N options of every customer
+        N = min(self.choice_N, utility.shape[1])
+        top_N = np.argpartition(utility, -N, axis=1)[:, -N:]
+        top_N_utility = np.take_along_axis(utility, top_N, axis=1)
+
+        # Gumbel-max sampling proportional to exp(utility)
+        if rngs is None:
+            gumbel = self.rng.gumbel(size=top_N_utility.shape)
+        else:
+            gumbel = np.stack([rng.gumbel(size=N) for rng in rngs])
+        seat = top_N[np.arange(B), np.argmax(top_N_utility + gumbel, axis=1)]
 
-        return action
+        selected = np.stack((seat // cols, seat % cols), axis=1)
+        selected[seat == rows*cols] = -1
+        return selected
 
     def observe(self):
         return self._publish
@@ -0,0 +1,91 @@
+import math
+import numpy as np
+from flai.core import Box
+from flai.envs.seatsmart.flight import PRODUCT_FIELDS
+
+
+class ObservationEncoder:
+    '''
+    Encodes the state of a SeatSmart game into one fixed shape float32
+    vector, written into a preallocated buffer so that no array is
+    allocated per step. The vector is the concatenation of:
+
+        Available (MaxRows, MaxCols) : 1 if the seat can be sold, else 0
+        Price (MaxRows, MaxCols) : zone price of the seat, 0 for ghost seats
+        Products (n_zones, 6) : per zone PRODUCT_FIELDS
+            [Sold, Available, Revenue, Price, MinPrice, MaxPrice]
+        TimeToDeparture (1,) : seconds left until departure
+
+    `views` returns the named parts of a buffer as reshaped views.
+
+    Args:
+        seatmap (SeatMap) : seat map of the encoded games
+
+    >> encoder = ObservationEncoder(game.CONFIG.SeatMap)
+    >> buffer = encoder.observation_space.zeros()
+    >> encoder.encode(game, out=buffer)
+    '''
+
+    def __init__(self, seatmap):
+        rows, cols = seatmap.MaxRows, seatmap.MaxCols
+        self.shapes = {
+            'Available': (rows, cols),
+            'Price': (rows, cols),
+            'Products': (len(seatmap.Zones), len(PRODUCT_FIELDS)),
+            'TimeToDeparture': (1,),
+        }
+        self.slices = {}
+        start = 0
+        for key, shape in self.shapes.items():
+            stop = start + int(np.prod(shape))
+            self.slices[key] = slice(start, stop)
+            start = stop
+        self.size = start
+
+    @property
+    def observation_space(self):
+        '''Typed space of the encoded observation (Box)'''
+        return Box(low=0, high=math.inf, shape=(self.size,), dtype=np.float32)
+
+    def views(self, out):
+        '''Named parts of an encoded observation (views, no copy)
+
+        Args:
+            out (np.array) : (size,) encoded observation
+
+        Returns:
+            dict: name -> reshaped view
+        '''
+        return {key: out[self.slices[key]].reshape(shape)
+                for key, shape in self.shapes.items()}
+
+    def encode(self, game, out=None):
+        '''Encodes the state of a game.
+
+        Args:
+            game (PricingGame) : game to encode
+            out (np.array) : preallocated (size,) float32 buffer
+                (default: a new one)
+
+        Returns:
+            np.array: out
+        '''
+        if out is None:
+            out = np.zeros(self.size, dtype=np.float32)
+        assert out.shape == (self.size,) and out.dtype == np.float32, \
+            'out shape and dtype are {}, {} and required is {}, float32'.format(
+                out.shape, out.dtype, (self.size,))
+
+        grid = game.flight.grid
+        parts = self.views(out)
+        np.copyto(parts['Available'], grid.available)
+        np.copyto(parts['Price'], grid.price)
+        np.copyto(parts['Price'], 0, where=grid.ghost)
+        game.flight.write_products(parts['Products'])
+
+        if game.game_over:
+            out[-1] = 0
+        else:
+            out[-1] = (game.CONFIG.ClockState.StopUTC -
+                       game.event_creator.spawned_time).total_seconds()
+        return out
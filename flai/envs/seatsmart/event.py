@@ -1,7 +1,7 @@
-from collections import OrderedDict
+from functools import lru_cache
+import heapq
 from flai.envs.seatsmart.models.event import EventState
 from flai.envs.seatsmart.models.customer import SpawnInfo
-import math
 from flai.utils import np_random
 import numpy as np
 import scipy.stats as ss
@@ -11,38 +11,139 @@ import logging
 logger = logging.getLogger("SeatSmart")
 
 
+@lru_cache(maxsize=None)
+def beta_max_pdf(a, b, start=0, stop=1, intervals=5000):
+    '''Maximum of the beta(x;a,b) density on a linespace. The
+    result only depends on the shape so it is computed once per
+    (a, b) and shared by every spawner.
+
+    Args:
+        a (float): beta function first parameter
+        b (float): beta function second parameter
+        start (int:0): start point in linespace
+        stop (int:1): stop point in linespace
+        intervals (int:5000): breakpoints from start to stop in linespace
+
+    Returns:
+        float: maximum value of the density
+    '''
+    return max(ss.beta.pdf(np.linspace(start, stop, intervals), a, b, 0, 1))
+
+
+def piecewise_envelope(intensity, breakpoints=64, resolution=16, margin=0.05):
+    '''Piecewise constant upper bound of an intensity on [0, 1]
+
+    Args:
+        intensity (callable): vectorized intensity
+        breakpoints (int): number of intervals
+        resolution (int): intensity samples per interval (endpoints included)
+        margin (float): relative safety margin
+
+    Returns:
+        tuple: interval edges (breakpoints+1,) and rates (breakpoints,)
+    '''
+    edges = np.linspace(0, 1, breakpoints+1)
+    x = edges[:-1, None] + np.linspace(0, 1, resolution)[None, :] * \
+        np.diff(edges)[:, None]
+    rates = np.max(intensity(x), axis=1) * (1 + margin)
+    return edges, rates
+
+
+@lru_cache(maxsize=1024)
+def beta_envelope(N, a, b, breakpoints=64, resolution=16, margin=0.05):
+    '''Envelope of the N x beta(x;a,b) intensity (see piecewise_envelope).
+    It only depends on the parameters so it is computed once per
+    parameters and shared (read only) by every spawner.'''
+    edges, rates = piecewise_envelope(
+        lambda x: N*ss.beta.pdf(x, a, b, 0, 1), breakpoints, resolution, margin)
+    edges.flags.writeable = False
+    rates.flags.writeable = False
+    return edges, rates
+
+
+def normalize_intensity(intensity, N, intervals=4096):
+    '''Rescales an intensity so that it integrates to N on [0, 1]
+    (midpoint rule)
+
+    Args:
+        intensity (callable): vectorized intensity
+        N (int): expected number of arrivals
+        intervals (int): integration intervals
+
+    Returns:
+        callable: N / integral x intensity
+    '''
+    x = (np.arange(intervals) + 0.5) / intervals
+    integral = np.mean(intensity(x))
+    if not integral > 0:
+        raise ValueError('Intensity should have a positive integral on [0, 1] but it is {}'.format(
+            integral))
+    scale = N / integral
+    return lambda t: scale * intensity(t)
+
+
 class NHPP_Thinning:
     '''Thinning algorithm to sample random variates from non homogeneous poisson process.
 
     URL: https://onlinelibrary.wiley.com/doi/10.1002/9780470400531.eorms0356
 
+    Candidates are drawn in NumPy blocks from a piecewise constant envelope
+    of the intensity (one rate per breakpoint interval) instead of one global
+    maximum, so the rejection rate stays low for peaky booking curves. The
+    envelope is estimated from `resolution` samples of the intensity in every
+    interval and inflated by `margin`. The envelope of the default intensity
+    is cached (see beta_envelope).
+
+    As in the original recursive engine, candidates after threshold_time
+    come at the maximum intensity lambda_u (N x max beta(x;a,b) for the
+    default intensity) and are all accepted.
+
+    Any vectorized callable can be used as the intensity, for example a
+    multi modal booking curve. By default the intensity is N x beta(x;a,b).
+    A custom intensity only gives the shape of the booking curve: it is
+    rescaled to integrate to N over the booking window [0, 1] (see
+    normalize_intensity), so that the N arrivals spread over the whole
+    window whatever its scale.
+
     Agrs:
         N (int): Total number of arrivals to simulate
         a (float): beta function first parameter
         b (float): beta function second parameter
-        threshold_time (float): time percentile to stop recursion and deliver time
+        threshold_time (float): time percentile after which every candidate is accepted
+        intensity (callable): vectorized rate of arrival function $\lambda(t)$,
+            up to a constant factor
+        breakpoints (int): number of envelope intervals on [0, 1]
+        resolution (int): intensity samples per envelope interval
+        margin (float): relative safety margin of the envelope
+        rng (Generator): random state of the draws (default: np_random.rng)
     '''
 
-    def __init__(self, N=100, a=1, b=1, threshold_time=0.95):
+    def __init__(self, N=100, a=1, b=1, threshold_time=0.95, intensity=None,
+                 breakpoints=64, resolution=16, margin=0.05, rng=None):
         self.N = N
+        self.rng = np_random.rng if rng is None else rng
         self.a = a
         self.b = b
         self.t = 0
         self.threshold_time = threshold_time
-        self.lambda_u = self.get_max_intensity()
-
-    def get_max_intensity(self, start=0, stop=1, intervals=5000):
-        '''Calculates the max intensity from intensity function
-
-        Args:
-            start (int:0): start point in linespace
-            stop (int:1): stop point in linespace
-            intervals (int:5000): breakpoints from start to stop in linespace
-
-        Returns:
-            int: maximum value in intensity function
-        '''
-        return max(self.intensity_function(np.linspace(start, stop, intervals)))
+        self.intensity = self.intensity_function if intensity is None else \
+            normalize_intensity(intensity, N)
+        if (intensity is None) and \
+                (type(self).intensity_function is NHPP_Thinning.intensity_function):
+            edges, rates = beta_envelope(N, a, b, breakpoints, resolution, margin)
+            self.lambda_u = self.N*beta_max_pdf(self.a, self.b)
+        else:
+            edges, rates = self.envelope(breakpoints, resolution, margin)
+            self.lambda_u = np.max(rates)
+        # The envelope stops at threshold_time, lambda_u is used after it
+        cut = min(threshold_time, edges[-1])
+        n = max(int(np.count_nonzero(edges[:-1] < cut)), 1)
+        self.edges = np.append(edges[:n], cut)
+        self.rates = rates[:n]
+        self._cumulative = np.concatenate(
+            ([0.], np.cumsum(self.rates*np.diff(self.edges))))
+        # position of the current time in the envelope time scale
+        self._s = 0.
 
     def intensity_function(self, x):
         '''Rate of arrival function $\lambda(t)$
@@ -60,51 +161,216 @@ class NHPP_Thinning:
         '''
         return self.N*ss.beta.pdf(x, self.a, self.b, 0, 1)
 
-    def inter_arrival_time(self, p, _lambda):
-        '''Inter arrival time based on inverse CDF
-
-        To find out more look at tutorial below.
-        URL: https://towardsdatascience.com/the-poisson-process-everything-you-need-to-know-322aa0ab9e9a
+    def envelope(self, breakpoints=64, resolution=16, margin=0.05):
+        '''Piecewise constant upper bound of the intensity on [0, 1]
 
         Args:
-            p (float): uniform random value from 0 to 1.
-            _lambda (float): arrival rate
+            breakpoints (int): number of intervals
+            resolution (int): intensity samples per interval (endpoints included)
+            margin (float): relative safety margin
 
         Returns:
-            float: inter arrival time. Calculate as -log(p)/lambda
+            tuple: interval edges (breakpoints+1,) and rates (breakpoints,)
         '''
-        assert (0 < p < 1), 'Invalid probability value: %s' & p
-        assert (_lambda > 0), 'Lambda > 0 but it is %s' % _lambda
-        return np.divide(-math.log(p), _lambda)
+        return piecewise_envelope(self.intensity, breakpoints, resolution, margin)
+
+    def _envelope_rate(self, t):
+        '''Envelope rate at time percentiles t'''
+        i = np.searchsorted(self.edges, t, side='right') - 1
+        return np.where(t < self.edges[-1],
+                        self.rates[np.clip(i, 0, len(self.rates)-1)],
+                        self.lambda_u)
+
+    def _envelope_inverse(self, s):
+        '''Time percentiles at envelope times s (inverse of the
+        cumulative envelope)'''
+        i = np.clip(np.searchsorted(self._cumulative, s, side='right') - 1,
+                    0, len(self.rates)-1)
+        rate = self.rates[i]
+        inside = self.edges[i] + np.divide(s - self._cumulative[i], rate,
+                                           out=np.zeros_like(s), where=rate > 0)
+        after = self.edges[-1] + (s - self._cumulative[-1]) / self.lambda_u
+        return np.where(s < self._cumulative[-1], inside, after)
+
+    def _draw(self, n):
+        '''Draws the next n arrival time percentiles'''
+        times = np.empty(n)
+        if n == 0:
+            return times
+
+        assert (self.lambda_u > 0), 'Lambda > 0 but it is %s' % self.lambda_u
+
+        # expected number of candidates per arrival
+        ratio = max(self._cumulative[-1] / max(self.N, 1), 1.)
+        filled = 0
+        while filled < n:
+            size = int((n - filled) * ratio * 1.1) + 16
+            s = self._s + np.cumsum(self.rng.exponential(size=size))
+            u = self.rng.random(size=size)
+
+            t = self._envelope_inverse(s)
+            accept = (u * self._envelope_rate(t) <= self.intensity(t)) | \
+                (t > self.threshold_time)
+
+            index = np.flatnonzero(accept)[:n - filled]
+            times[filled:filled+len(index)] = t[index]
+            filled += len(index)
+
+            # continue from the last used candidate
+            last = index[-1] if filled == n else size - 1
+            self._s = s[last]
+
+        self.t = times[-1]
+        return times
 
-    def arrival_time(self, current_time):
-        '''Next arrival time. Main logic.
+    def spawn(self):
+        '''Spawn time creator.
 
-        Args:
-            current_time (float): Time percentile
+        Returns:
+            float: spawn time percentile.
+        '''
+        return float(self._draw(1)[0])
+
+    def sample(self):
+        '''Spawn time percentiles of all the N arrivals.
 
         Returns:
-            float: next arrival time
+            list: sorted spawn time percentiles.
         '''
-        u1 = np_random.rng.random()
+        return self._draw(self.N).tolist()
 
-        _time = current_time + self.inter_arrival_time(u1, self.lambda_u)
-        lambda_ = self.intensity_function(_time)
 
-        u2 = np_random.rng.random()
-        if u2 <= (lambda_/self.lambda_u) or _time > self.threshold_time:
-            return _time
-        else:
-            return self.arrival_time(_time)
+class BetaOrderStatistics:
+    '''Order statistics sampler for a beta shaped intensity with a fixed
+    number of arrivals.
 
-    def spawn(self):
-        '''Spawn time creator.
+    Given N arrivals of a non homogeneous poisson process with intensity
+    N x beta(x;a,b), the arrival time percentiles are distributed as the
+    sorted values of N independent Beta(a,b) variates. All of them are
+    drawn with one vectorized call, so the cost does not depend on the
+    rejection rate and there is no recursion.
+
+    As in NHPP_Thinning, where every candidate after threshold_time is
+    accepted, the arrivals that fall after threshold_time are delivered
+    right after it with exponential gaps at the maximum intensity.
+
+    Agrs:
+        N (int): Total number of arrivals to simulate
+        a (float): beta function first parameter
+        b (float): beta function second parameter
+        threshold_time (float): time percentile after which arrivals are
+            delivered at the maximum intensity
+        rng (Generator): random state of the draws (default: np_random.rng)
+    '''
+
+    def __init__(self, N=100, a=1, b=1, threshold_time=0.95, rng=None):
+        self.N = N
+        self.rng = np_random.rng if rng is None else rng
+        self.a = a
+        self.b = b
+        self.threshold_time = threshold_time
+        self.lambda_u = self.N*beta_max_pdf(self.a, self.b)
+
+    def sample(self):
+        '''Spawn time percentiles of all the N arrivals.
 
         Returns:
-            float: spawn time percentile.
+            list: sorted spawn time percentiles.
+        '''
+        percentiles = np.sort(self.rng.beta(self.a, self.b, size=self.N))
+
+        late = percentiles > self.threshold_time
+        n_late = np.count_nonzero(late)
+        if n_late:
+            gaps = self.rng.exponential(
+                scale=1/self.lambda_u, size=n_late)
+            percentiles[late] = self.threshold_time + np.cumsum(gaps)
+        return percentiles.tolist()
+
+
+# Arrival engines selectable with CustomerType.ArrivalEngine
+ARRIVAL_ENGINES = {
+    'Thinning': NHPP_Thinning,
+    'OrderStatistics': BetaOrderStatistics,
+}
+
+
+class EventScheduler:
+    '''
+    Discrete event scheduler. The events known upfront (e.g. all the
+    customer arrivals of an episode) are kept as sorted NumPy arrays of
+    time percentiles and integer event codes and are consumed with a
+    cursor. Events scheduled later (arrivals or other event kinds such
+    as price reviews, see EventCreator.register) go to a heap and are
+    merged on the fly. Events with the same time are all kept and
+    delivered in a stable order.
+
+    Args:
+        times (array) : time percentile of every event
+        codes (array) : integer code of every event (index in names)
+        names (list) : event name per code
+
+    >> scheduler = EventScheduler([0.2, 0.1], [0, 1], ['Regular', 'Business'])
+    >> scheduler.pop(), scheduler.time
+    >>> (1, 0.1)
+    '''
+
+    def __init__(self, times=(), codes=(), names=()):
+        times = np.asarray(times, dtype=np.float64)
+        order = np.argsort(times, kind='stable')
+        self.times = times[order]
+        self.codes = np.asarray(codes, dtype=np.int32)[order]
+        self.names = list(names)
+        self._size = len(self.times)
+        self._cursor = 0
+        self._heap = []
+        self._counter = 0
+        self.time = None
+
+    def __len__(self):
+        return self._size - self._cursor + len(self._heap)
+
+    def code(self, name):
+        '''Integer code of an event name (new names get a new code)'''
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def schedule(self, time, name):
+        '''Inserts an event
+
+        Args:
+            time (float) : time percentile of the event
+            name (str) : event name
+        '''
+        heapq.heappush(self._heap, (time, self._counter, self.code(name)))
+        self._counter += 1
+
+    def peek(self):
+        '''Time percentile of the next event (None if there is none)'''
+        if self._cursor < self._size:
+            if self._heap and self._heap[0][0] < self.times[self._cursor]:
+                return self._heap[0][0]
+            return self.times.item(self._cursor)
+        return self._heap[0][0] if self._heap else None
+
+    def pop(self):
+        '''Removes the next event. Its time percentile is stored
+        in `time`.
+
+        Returns:
+            int: event code (-1 if there are no more events)
         '''
-        self.t = self.arrival_time(self.t)
-        return self.t
+        i = self._cursor
+        if i < self._size and not (self._heap and self._heap[0][0] < self.times[i]):
+            self._cursor = i + 1
+            self.time = self.times.item(i)
+            return self.codes.item(i)
+        if self._heap:
+            self.time, _, code = heapq.heappop(self._heap)
+            return code
+        self.time = None
+        return -1
 
 
 class EventCreator:
@@ -116,18 +382,32 @@ class EventCreator:
 
     Args:
         EventState(EventState) : State holder for Event Creator
+        intensities (dict) : optional vectorized intensity function
+            per customer type name, used by the thinning engine
+            instead of the beta shaped intensity. Only its shape
+            matters, it is rescaled to the demand of the customer type
+            (see NHPP_Thinning)
+        rng (Generator) : random state of the arrival engines
+            (default: np_random.rng)
+        validate (bool) : validate the spawn infos (see PricingGame)
     '''
 
-    def __init__(self, EventState):
+    def __init__(self, EventState, intensities=None, rng=None, validate=True):
         self.state = EventState
+        self.intensities = intensities or {}
+        self.rng = np_random.rng if rng is None else rng
+        self.validate = validate
         self.delta = EventState.Clock.StopUTC - EventState.Clock.StartUTC
+        self.handlers = {}
         self.future = self.generate(EventState.CustomerTypes)
         self.valid_customer = True
         self.spawned_time = None
 
     def tick(self):
         '''
-        Main logic to create an event.
+        Main logic to create an event. Events of the other kinds (see
+        register) are handed to their handler on the way to the next
+        customer arrival.
 
         Returns:
             tuple: Customer Spawn Info (BaseModel), Game Over (Bool)
@@ -135,33 +415,91 @@ class EventCreator:
 
         spawned_time, spawned_customer = datetime.datetime.min, 'None'
 
-        try:
-            key = next(iter(self.future))
-            spawned_customer = self.future[key]
-            self.future.pop(key)
-            spawned_time = self.state.Clock.StartUTC + (key*self.delta)
-
-            if spawned_time > self.state.Clock.StopUTC:
+        while True:
+            code = self.future.pop()
+            if code < 0:
+                logger.debug('No more events to spawn')
                 self.valid_customer = False
-        except Exception as e:
-            logger.error(e)
-            self.valid_customer = False
+                break
+            event_time = self.state.Clock.StartUTC + (self.future.time*self.delta)
+            if code < self._n_arrivals:
+                spawned_customer = self.future.names[code]
+                spawned_time = event_time
+                if spawned_time > self.state.Clock.StopUTC:
+                    self.valid_customer = False
+                break
+            if event_time <= self.state.Clock.StopUTC:
+                self.handlers[self.future.names[code]](event_time)
 
         self.spawned_time = spawned_time
-        return SpawnInfo(Time=spawned_time,
-                         CustomerTypeName=spawned_customer),  self.valid_customer
+        if self.validate:
+            spawn_info = SpawnInfo(Time=spawned_time,
+                                   CustomerTypeName=spawned_customer)
+        else:
+            spawn_info = SpawnInfo.construct(Time=spawned_time,
+                                             CustomerTypeName=spawned_customer)
+        return spawn_info, self.valid_customer
 
     def generate(self, CustomerTypes):
         '''
+        Creates the arrivals of all the customer types. Their codes
+        come first in the scheduler names, the other event kinds get
+        the following codes.
+
+        Args:
+            CustomerTypes (list) : CustomerType objects
+
+        Returns:
+            EventScheduler: arrivals ordered by time
         '''
-        events = {}
-        for customer in CustomerTypes:
+        times, codes = [], []
+        for code, customer in enumerate(CustomerTypes):
             _demand = round(self.state.Demand * customer.SpawnProba)
-            spawner = NHPP_Thinning(
-                N=_demand, a=customer.ArrivalAlpha, b=customer.ArrivalBeta)
-            arrival_percentile = [spawner.spawn() for _ in range(_demand)]
-            events.update(dict.fromkeys(arrival_percentile, customer.Name))
-        return OrderedDict(sorted(events.items()))
+            if customer.Name in self.intensities:
+                spawner = NHPP_Thinning(N=_demand,
+                                        intensity=self.intensities[customer.Name],
+                                        rng=self.rng)
+            else:
+                spawner = ARRIVAL_ENGINES[customer.ArrivalEngine](
+                    N=_demand, a=customer.ArrivalAlpha, b=customer.ArrivalBeta,
+                    rng=self.rng)
+            arrival_percentile = spawner.sample()
+            times.append(arrival_percentile)
+            codes.append(np.full(len(arrival_percentile), code))
+        self._n_arrivals = len(CustomerTypes)
+        return EventScheduler(times=np.concatenate(times) if times else [],
+                              codes=np.concatenate(codes) if codes else [],
+                              names=[customer.Name for customer in CustomerTypes])
+
+    def register(self, name, handler):
+        '''
+        Registers the handler of an event kind that is not a customer
+        arrival (e.g. a cancellation or a price review). tick calls
+        handler(time) with the datetime of every such event scheduled
+        before departure.
+
+        Args:
+            name (str) : event name
+            handler (callable) : called with the time of the event
+        '''
+        if name in self.future.names[:self._n_arrivals]:
+            raise ValueError('{} is a customer type, its events are arrivals'.format(name))
+        self.handlers[name] = handler
+
+    def schedule(self, spawn_time, name):
+        '''
+        Inserts an event in the middle of an episode: a customer
+        arrival, or an event kind with a registered handler.
+
+        Args:
+            spawn_time (datetime) : time of the event
+            name (str) : customer type name or registered event name
+        '''
+        if name not in self.handlers and name not in self.future.names[:self._n_arrivals]:
+            raise ValueError('Unknown event {}, expected a customer type or one of {}'.format(
+                name, list(self.handlers)))
+        self.future.schedule(
+            (spawn_time - self.state.Clock.StartUTC) / self.delta, name)
 
     def refresh(self):
-        self.future = self.generate(EventState.CustomerTypes)
+        self.future = self.generate(self.state.CustomerTypes)
@@ -0,0 +1,201 @@
+import numpy as np
+from scipy.ndimage import binary_erosion, binary_opening, distance_transform_cdt
+
+
+def edge_distance(img):
+    """Cityblock distance of every available seat to the contour of the
+    available area plus one (contour seats get 1, unavailable seats 0).
+
+    A step away from an interior seat always lands on an available seat,
+    so the closest contour seat is also the closest non interior seat and
+    a taxicab distance transform of the interior gives the distances in
+    linear time.
+
+    Args:
+        img (np.array) : availability matrix (non zero if available)
+
+    Returns:
+        tuple: (rows, cols) int distances and whether there is a contour
+            (False for a map without available seats or a fully available
+            map, the distances are all zeros then)
+    """
+    interior = binary_erosion(img, border_value=1)  # Interior mask
+    C = (img != 0) & ~interior     # Contour mask
+    # Setup o/p and assign cityblock distances
+    out = C.astype(int)
+
+    # No contour (no available seat or a fully available map)
+    if not C.any():
+        return out, False
+
+    out[interior] = distance_transform_cdt(
+        interior, metric='taxicab')[interior] + 1
+    return out, True
+
+
+def scan_groupseats(img, size=1):
+    """Seats that are part of a run of at least `size` available seats
+    in their row (see SeatCustomer_MNL._scan_groupseats)."""
+    structure = np.ones((1, size))
+    return binary_opening(img, structure=structure).astype(img.dtype)
+
+
+def run_lengths(row):
+    """Length of the run of available seats that every seat of a row
+    belongs to (0 for unavailable seats). Rows are short, a plain loop
+    is cheaper than array calls here."""
+    values = row.tolist()
+    out = [0] * len(values)
+    start = None
+    for i, value in enumerate(values + [0]):
+        if value and start is None:
+            start = i
+        elif not value and start is not None:
+            out[start:i] = [i - start] * (i - start)
+            start = None
+    return np.array(out)
+
+
+class SeatFeatures:
+    """Availability dependent customer features of a seat map (the
+    isolation map and the group seat masks) that are kept up to date on
+    every seat sale instead of being recomputed for every customer.
+
+    Selling a seat only touches its row for the group seat masks. For
+    the isolation map, the seat and its available neighbours become the
+    new contour and distances can only decrease, so only the patch of
+    seats closer to the sold seat than the largest distance is updated.
+    Sales are applied lazily on the next read, so a flight whose
+    features are never read does not pay for them. The results are
+    bit-identical to a full recompute. With `debug` every read is
+    checked against a full recompute.
+
+    Args:
+        available (np.array) : (rows, cols) bool availability of the seats
+        debug (bool) : verify every read (default: SeatFeatures.DEBUG)
+
+    Example :
+        features = SeatFeatures(flight.grid.available)
+        features.sell(3, 2)
+        features.isolation(), features.group_seats(2)
+    """
+
+    DEBUG = False
+
+    def __init__(self, available, debug=None):
+        self.available = np.array(available, dtype=bool)
+        self.debug = self.DEBUG if debug is None else debug
+        self.refresh()
+
+    def refresh(self, available=None):
+        """Full recompute of the features (optionally from a new
+        availability matrix)."""
+        if available is not None:
+            self.available = np.array(available, dtype=bool)
+        self._img = self.available.astype(np.float64)
+        self._n_available = int(np.count_nonzero(self.available))
+        self._distance, self._has_contour = edge_distance(self._img)
+        self._groups = {}
+        self._pending = []
+
+    def copy(self):
+        """Independent copy of the features (no recompute)"""
+        features = SeatFeatures.__new__(SeatFeatures)
+        features.available = self.available.copy()
+        features.debug = self.debug
+        features._img = self._img.copy()
+        features._n_available = self._n_available
+        features._distance = self._distance.copy()
+        features._has_contour = self._has_contour
+        features._groups = {size: mask.copy()
+                            for size, mask in self._groups.items()}
+        features._pending = list(self._pending)
+        return features
+
+    def matches(self, img):
+        """True if the features describe the availability matrix img"""
+        return img.shape == self.available.shape and \
+            np.array_equal(img != 0, self.available)
+
+    def sell(self, row, col):
+        """Marks a seat as not available. The features are updated
+        on the next read."""
+        if not self.available[row, col]:
+            return
+        self.available[row, col] = False
+        self._pending.append((row, col))
+
+    def _apply(self):
+        """Applies the pending sales to the features."""
+        pending, self._pending = self._pending, []
+        for row, col in pending:
+            self._update(row, col)
+
+    def _update(self, row, col):
+        """Updates the features for one sold seat."""
+        self._img[row, col] = 0
+        self._n_available -= 1
+
+        # Group seat masks only change in the row of the seat
+        if self._groups:
+            runs = run_lengths(self._img[row])
+            for size, mask in self._groups.items():
+                mask[row] = runs >= size
+
+        if not self._has_contour:
+            # The seat map had no contour, the first one needs a full pass
+            self._distance, self._has_contour = edge_distance(self._img)
+            return
+
+        if self._n_available == 0:
+            # Last available seat sold
+            self._distance[row, col] = 0
+            self._has_contour = False
+            return
+
+        distance = self._distance
+        rows, cols = distance.shape
+        radius = int(distance.max())
+        distance[row, col] = 0
+
+        # Available neighbours of the sold seat are the new contour
+        contour = [(r, c) for r, c in ((row-1, col), (row+1, col), (row, col-1), (row, col+1))
+                   if 0 <= r < rows and 0 <= c < cols and self._img[r, c]]
+        if not contour:
+            return
+
+        r0, r1 = max(row - radius, 0), min(row + radius + 1, rows)
+        c0, c1 = max(col - radius, 0), min(col + radius + 1, cols)
+        patch = distance[r0:r1, c0:c1]
+        r_index = np.arange(r0, r1)[:, None]
+        c_index = np.arange(c0, c1)[None, :]
+        nearest = np.min([np.abs(r_index - r) + np.abs(c_index - c)
+                          for r, c in contour], axis=0) + 1
+        patch[...] = np.where(patch > 0, np.minimum(patch, nearest), patch)
+
+    def isolation(self):
+        """Normalized distance to the nearest occupied seat
+        (see SeatCustomer_MNL._dist_from_edge)"""
+        self._apply()
+        if self._has_contour:
+            out = self._distance / np.max(self._distance)
+        else:
+            out = self._distance.copy()
+        if self.debug:
+            distance, has_contour = edge_distance(self._img)
+            expected = distance / np.max(distance) if has_contour else distance
+            assert np.array_equal(out, expected), \
+                'Incremental isolation map differs from a full recompute'
+        return out
+
+    def group_seats(self, size):
+        """Seats in a run of at least `size` available seats
+        (see SeatCustomer_MNL._scan_groupseats)"""
+        self._apply()
+        if size not in self._groups:
+            self._groups[size] = scan_groupseats(self._img, size)
+        out = self._groups[size].copy()
+        if self.debug:
+            assert np.array_equal(out, scan_groupseats(self._img, size)), \
+                'Incremental group seat mask differs from a full recompute'
+        return out
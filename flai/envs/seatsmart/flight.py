@@ -1,17 +1,129 @@
+import copy
+import numpy as np
+from flai.envs.seatsmart.features import SeatFeatures
+
+
+# Numeric fields of a segment product (see Flight.write_products)
+PRODUCT_FIELDS = ('Sold', 'Available', 'Revenue',
+                  'Price', 'MinPrice', 'MaxPrice')
+
+
+class ZoneIndex:
+    '''
+    Zone definitions of a seat map compiled into arrays. A seat
+    belongs to the last zone (in SeatMap.Zones order) that includes
+    its row and does not exclude its column or the seat itself.
+    Seats that no zone claims belong to the first zone.
+
+    Attributes:
+        names (list) : zone names ordered as SeatMap.Zones
+        index (np.array) : (MaxRows, MaxCols) int16 zone index per seat
+        masks (np.array) : (n_zones, MaxRows, MaxCols) bool mask per zone
+
+    >> zones = ZoneIndex(SeatMap())
+    '''
+
+    def __init__(self, seatmap):
+        self.seatmap = seatmap
+        self.key = self.seatmap_key(seatmap)
+        self.names = [zone.Name for zone in seatmap.Zones]
+
+        rows, cols = seatmap.MaxRows, seatmap.MaxCols
+        self.index = np.zeros((rows, cols), dtype=np.int16)
+        for i, zone in enumerate(seatmap.Zones):
+            mask = np.isin(np.arange(rows), zone.IncludeRows)[:, None] & \
+                ~np.isin(np.arange(cols), zone.ExcludeCols)[None, :]
+            for _row, _col in zone.ExcludeSeats:
+                if (0 <= _row < rows) and (0 <= _col < cols):
+                    mask[_row, _col] = False
+            # Last match wins
+            self.index[mask] = i
+
+        self.masks = self.index[None, :, :] == np.arange(
+            len(self.names))[:, None, None]
+
+    @staticmethod
+    def seatmap_key(seatmap):
+        '''Hashable description of the zone layout of a seat map'''
+        return (seatmap.MaxRows, seatmap.MaxCols) + tuple(
+            (zone.Name, tuple(zone.IncludeRows), tuple(zone.ExcludeCols),
+             tuple(tuple(seat) for seat in zone.ExcludeSeats))
+            for zone in seatmap.Zones)
+
+    def is_valid(self, seatmap):
+        '''True if the index still describes the seat map'''
+        return (seatmap is self.seatmap) and (self.seatmap_key(seatmap) == self.key)
+
+
 class Flight:
     '''
     Flight is a abstraction of an actual flight.
     A flight object can be initialized with a FlightBaseState
     object (check the definition in models)
 
+    Per zone availability, sold seats and revenue are kept in
+    a ledger that is updated on every sale, so reading them does
+    not scan the seat grid. The availability dependent customer
+    features (SeatFeatures) are also updated on every sale. Call
+    `recount` after changing the seat grid arrays directly.
+
+    With validate=False, zone prices are checked against the price
+    rule bounds by hand instead of a pydantic validated assignment
+    (see PricingGame).
+
     >> flight = Flight(FlightBaseState())
     '''
 
-    def __init__(self, base_state):
+    def __init__(self, base_state, validate=True):
         self.state = base_state  # TODO: assert it is fligt base state object
+        self.validate = validate
+        self.grid = base_state.seat_grid
+        self._zone_index = None
+        self._products = None
+        self.base_count = None
+        self.features = SeatFeatures(self.grid.available)
+        self.reindex()
         self.base_count = self._count_seats(base_state)
         self.tickets = sum(self.base_count.values())
         self.zone_revenue = self._zone_dict_init(base_state.SeatMap)
+        self.recount()
+
+    def copy(self, validate=None):
+        '''Copy of the flight with its own price rules, seat grid,
+        ledger and customer features. The compiled zone index and the
+        base seat counts are shared, so copying a flight is much cheaper
+        than building one from a FlightBaseState.
+
+        Args:
+            validate (bool) : validate flag of the copy (default: the
+                flag of this flight)
+
+        Returns:
+            Flight
+        '''
+        state = self.state
+        zones = [zone.copy(update={'PriceRule': zone.PriceRule.copy()})
+                 for zone in state.SeatMap.Zones]
+        seatmap = state.SeatMap.copy(update={'Zones': zones})
+        base_state = state.copy(update={'SeatMap': seatmap})
+        base_state._seat_grid = self.grid.copy()
+
+        zone_index = copy.copy(self.zone_index)
+        zone_index.seatmap = seatmap
+
+        flight = Flight.__new__(Flight)
+        flight.state = base_state
+        flight.validate = self.validate if validate is None else validate
+        flight.grid = base_state.seat_grid
+        flight._zone_index = zone_index
+        flight._products = None
+        flight.base_count = self.base_count
+        flight.tickets = self.tickets
+        flight.zone_revenue = dict(self.zone_revenue)
+        flight._available = dict(self._available)
+        flight._sold = dict(self._sold)
+        flight.features = self.features.copy()
+        return flight
 
     def _zone_dict_init(self, seatmap):
         d = {}
@@ -20,30 +132,75 @@ class Flight:
         return d
 
     def _seat_to_zonename(self, state, seat):
-        name = state.SeatMap.Zones[0].Name
-        for zone in state.SeatMap.Zones:
-            if (seat.Row in zone.IncludeRows) and (seat.Col not in zone.ExcludeCols) and ((seat.Row, seat.Col) not in zone.ExcludeSeats):
-                name = zone.Name
-        return name
+        zones = self.zone_index if state is self.state else ZoneIndex(
+            state.SeatMap)
+        return zones.names[zones.index[seat.Row, seat.Col]]
+
+    @property
+    def zone_index(self):
+        '''Compiled zones of the current seat map (ZoneIndex). The
+        index is rebuilt when the seat map of the state is replaced.
+        Call `reindex` after changing the zones of the seat map in
+        place.'''
+        if self.state.SeatMap is not self._zone_index.seatmap:
+            self.reindex()
+        return self._zone_index
+
+    def reindex(self):
+        '''Compiles the zones of the seat map and assigns the zone
+        index and the zone price of every seat in the seat grid.'''
+        seatmap = self.state.SeatMap
+        if (self._zone_index is None) or (not self._zone_index.is_valid(seatmap)):
+            self._zone_index = ZoneIndex(seatmap)
+        self.grid.zone_names = self._zone_index.names
+        self.grid.zone[...] = self._zone_index.index
+        self.grid.price[...] = self._zone_prices(seatmap)[self.grid.zone]
+        if self.base_count is not None:
+            self.recount()
+
+    def recount(self):
+        '''Rebuilds the availability and sold ledger from the
+        seat grid.'''
+        self._available = self._count_seats(state=self.state)
+        self._sold = {key: self.base_count[key] - self._available.get(key, 0)
+                      for key in self._available}
+        self._products = None
+        self.features.refresh(self.grid.available)
+
+    def _zone_prices(self, seatmap):
+        '''Current price of every zone (ordered as SeatMap.Zones)'''
+        return np.array([zone.PriceRule.Price for zone in seatmap.Zones], dtype=np.float64)
 
     def _count_seats(self, state):
         d = self._zone_dict_init(seatmap=state.SeatMap)
 
-        for row in state.Grid:
-            for seat in row:
-                if (not seat.Blocked) and (not seat.Ghost) and (seat.Available):
-                    # Valid available seat
-                    d[self._seat_to_zonename(state=state, seat=seat)] += 1
+        grid = state.seat_grid
+        zones = self.zone_index if state is self.state else ZoneIndex(
+            state.SeatMap)
+        valid = (~grid.blocked) & (~grid.ghost) & grid.available
+        counts = np.bincount(zones.index[valid], minlength=len(d))
+        for i, key in enumerate(d):
+            d[key] = int(counts[i])
         return d
 
+    def seat_prices(self):
+        '''Price matrix as seen by a customer: zone price for
+        available seats, -1 for ghost seats and 0 otherwise.
+
+        Returns:
+            np.array: (MaxRows, MaxCols) float64 matrix
+        '''
+        grid = self.grid
+        prices = self._zone_prices(self.state.SeatMap)[self.zone_index.index]
+        return np.where(grid.available, prices, -1.0 * grid.ghost)
+
     @property
     def availability(self):
-        return self._count_seats(state=self.state)
+        return dict(self._available)
 
     @property
     def sold(self):
-        c = self._count_seats(state=self.state)
-        return {key: self.base_count[key] - c.get(key, 0) for key in c}
+        return dict(self._sold)
 
     @property
     def ticket_sold(self):
@@ -59,53 +216,94 @@ class Flight:
             d[zone.Name]['MaxPrice'] = zone.PriceRule.MaxPrice
         return d
 
+    @staticmethod
+    def _set_price(rule, price):
+        '''Assigns a price to a PriceRule without pydantic validation,
+        with the bounds checks of PriceRule.'''
+        price = float(price)
+        if price < 0:
+            raise ValueError('Non Negative value')
+        if rule.MaxPrice < price:
+            raise ValueError(
+                'Price greater than max value are not allowed. {} < {}'.format(rule.MaxPrice, price))
+        if rule.MinPrice > price:
+            raise ValueError(
+                'Price less than min value are not allowed. {} > {}'.format(rule.MinPrice, price))
+        rule.__dict__['Price'] = price
+
     @zone_price.setter
     def zone_price(self, x):
         for key in x:
             for zone in self.state.SeatMap.Zones:
-                if key == zone.Name:
-                    zone.PriceRule.Price = x[key]
+                if key == zone.Name and zone.PriceRule.Price != x[key]:
+                    if self.validate:
+                        zone.PriceRule.Price = x[key]
+                    else:
+                        self._set_price(zone.PriceRule, x[key])
+                    self._products = None
+        self.grid.price[...] = self._zone_prices(
+            self.state.SeatMap)[self.zone_index.index]
 
     def sell_seat(self, row, col):
-        seat = self.state.Grid[row][col]
+        grid = self.grid
 
         # Check for valid seat
-        assert (not seat.Blocked), "Transaction failed. Seat {},{} is Blocked".format(
+        assert (not grid.blocked[row, col]), "Transaction failed. Seat {},{} is Blocked".format(
             row, col)
-        assert (not seat.Ghost), "Transaction failed. Seat {},{} is Ghost".format(
+        assert (not grid.ghost[row, col]), "Transaction failed. Seat {},{} is Ghost".format(
             row, col)
-        assert (seat.Available), "Transaction failed. Seat {},{} is not available".format(
+        assert (grid.available[row, col]), "Transaction failed. Seat {},{} is not available".format(
             row, col)
         assert (self.tickets >= 0), "Transaction failed. All tickets are sold".format(
             row, col)
 
         # if the seat is valid then update the zone revenue
-        zonename = self._seat_to_zonename(state=self.state, seat=seat)
-        for zone in self.state.SeatMap.Zones:
-            if zonename == zone.Name:
-                seat_revenue = zone.PriceRule.Price
-                self.zone_revenue[zonename] += seat_revenue
+        zone = self.state.SeatMap.Zones[self.zone_index.index[row, col]]
+        seat_revenue = zone.PriceRule.Price
+        self.zone_revenue[zone.Name] += seat_revenue
 
         # finally sell the seat
-        self.state.Grid[row][col].Available = False
+        grid.available[row, col] = False
+        self.features.sell(row, col)
+        self._available[zone.Name] -= 1
+        self._sold[zone.Name] += 1
+        self._products = None
         return seat_revenue
 
+    def write_products(self, out):
+        '''Writes the segment products into a (n_zones, 6) array with
+        the columns of PRODUCT_FIELDS, without building the product
+        dicts.
+
+        Args:
+            out (np.array) : output array
+        '''
+        for z, zone in enumerate(self.state.SeatMap.Zones):
+            rule = zone.PriceRule
+            row = out[z]
+            row[0] = self._sold[zone.Name]
+            row[1] = self._available[zone.Name]
+            row[2] = self.zone_revenue[zone.Name]
+            row[3] = rule.Price
+            row[4] = rule.MinPrice
+            row[5] = rule.MaxPrice
+        return out
+
     def sell_ticket(self, number=1):
         self.tickets -= number
         return True
 
     def __call__(self):
-        product_list = []
-        zp = self.zone_price
-        avail = self.availability
-        sold = self.sold
-        revenue = self.zone_revenue
-        for key in zp.keys():
-            product = {}
-            product["Name"] = key
-            product["Sold"] = sold[key]
-            product["Available"] = avail[key]
-            product["Revenue"] = revenue[key]
-            product.update(zp[key])
-            product_list.append(product)
-        return product_list
+        if self._products is None:
+            product_list = []
+            zp = self.zone_price
+            for key in zp.keys():
+                product = {}
+                product["Name"] = key
+                product["Sold"] = self._sold[key]
+                product["Available"] = self._available[key]
+                product["Revenue"] = self.zone_revenue[key]
+                product.update(zp[key])
+                product_list.append(product)
+            self._products = product_list
+        return [dict(product) for product in self._products]
@@ -1,82 +1,175 @@
 from flai.envs.seatsmart.flight import Flight
 from flai.envs.seatsmart.event import EventCreator
+from flai.envs.seatsmart.observation import ObservationSkeleton
 from flai.envs.seatsmart.models.event import EventState
 from flai.envs.seatsmart.models.flight import GameState, SeatMap, FlightBaseState
-from flai.envs.seatsmart.models import customer, analyst
+from flai.envs.seatsmart.models import customer
+from flai.utils import seed_sequence, make_rng
+from flai.envs.seatsmart.telemetry import events_enabled, emit_event
+from flai.envs.seatsmart.metrics import GameMetrics, clock
 
 import logging
 logger = logging.getLogger("SeatSmart")
 
 
-class PricingGame:
+class GameTemplate:
     '''
-    This class provides a cli for the agent that
-    is pricing seats in a flight. To create an
-    object from this class, you need to pass GameState
-    object that is present in the models module.
-    Parameters of the CLI object can be changed.
+    Parts of the games of one configuration that do not change during
+    a game, validated and compiled once: the config (GameState), a
+    flight with its zone index, seat counts and customer features, the
+    observation skeleton, the customer model with its parameter tables
+    and the event state. A game built from a template only copies the
+    small mutable state (price rules, seat grid and ledger) and draws a
+    new arrival schedule.
 
     Args:
-        config :
+        config (dict) : GameState parameters
 
+    >> template = GameTemplate(config)
+    >> game = PricingGame(seed=seed, template=template)
     '''
 
-    # base config
-    CONFIG: GameState = None
-
     def __init__(self, config: dict = {}):
-
         self.CONFIG = GameState(**config)
-        logger.debug(':video_game: Game state config: {}'.format(
-            self.CONFIG.dict()))
-
         flight_base_state = FlightBaseState(SeatMap=self.CONFIG.SeatMap,
                                             FlightInfo=self.CONFIG.FlightInfo)
-
-        # Create a flight
         self.flight = Flight(flight_base_state)
-        logger.debug(':airplane: Initializing flight with seat map config : {}'.format(
-            flight_base_state.SeatMap.dict()))
-
-        # Create total seat revenue
-        self.total_seat_revenue = self.CONFIG.RevenueInfo.TotalSeatRevenue
-        logger.debug(':money_with_wings: Initializing flight with total seat revenue : {}'.format(
-            self.total_seat_revenue))
+        self.observation_skeleton = ObservationSkeleton(self.CONFIG)
 
         from flai.envs.seatsmart.customer import SeatCustomer_MNL
         self.seat_customer = SeatCustomer_MNL()
-        publish_hook = self.seat_customer.observe()
-        logger.debug(':leftwards_arrow_with_hook: Published customer hook: {}'.format(
-            publish_hook.dict()))
 
         # Demand should be created from flight base state availability
         # TODO: Make the demand as a sample from the distribution (gamma)
         self.event_state = EventState(Clock=self.CONFIG.ClockState,
                                       Demand=self.flight.tickets,
-                                      CustomerTypes=publish_hook.CustomerTypes)
-        self.event_creator = EventCreator(self.event_state)
-        logger.debug(':checkered_flag: Initializing event with event state : {}'.format(
-            self.event_state.dict()))
+                                      CustomerTypes=self.seat_customer.observe().CustomerTypes)
+
+
+class PricingGame:
+    '''
+    This class provides a cli for the agent that
+    is pricing seats in a flight. To create an
+    object from this class, you need to pass GameState
+    object that is present in the models module.
+    Parameters of the CLI object can be changed.
+
+    Args:
+        config (dict) : GameState parameters
+        seed (int/SeedSequence) : seed of the game. The customer
+            arrivals and the customer choices draw from two Generators
+            spawned from it (default: fresh OS entropy)
+        validate (bool) : validate the per step models (spawn infos,
+            customer contexts, observations and actions, price
+            assignments). The config is always validated. With False
+            the models are built with pydantic construct() and the
+            prices are only checked against their bounds. This mode is
+            for trusted callers (the agents of the envs): invalid values
+            are not caught. On the default 30x6 seat map a
+            SeatSmartEnv step goes from about 0.95 ms to 0.55 ms, and
+            from 1.8 ms to 0.55 ms on a 100x12 map
+            (`python -m benchmarks.suite run --filter step`)
+        metrics (GameMetrics) : phase timers and counters updated by
+            the game, e.g. shared over the games of an env (default: a
+            new one)
+        template (GameTemplate) : validated parts of the game, e.g.
+            shared over the games of an env. `config` is ignored when
+            it is given (default: built from config)
+
+    '''
+
+    # base config
+    CONFIG: GameState = None
+
+    def __init__(self, config: dict = {}, seed=None, validate: bool = True,
+                 metrics: GameMetrics = None, template: GameTemplate = None):
+
+        self.metrics = GameMetrics() if metrics is None else metrics
+        self.seed_sequence = seed_sequence(seed)
+        event_seed, customer_seed = self.seed_sequence.spawn(2)
+        self.validate = validate
+        if template is None:
+            template = GameTemplate(config)
+
+        # Create a flight (own price rules and seat grid)
+        self.flight = template.flight.copy(validate=validate)
+        seatmap = self.flight.state.SeatMap
+        self.CONFIG = template.CONFIG.copy(update={'SeatMap': seatmap})
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(':video_game: Game state config: %s',
+                         self.CONFIG.dict())
+            logger.debug(':airplane: Initializing flight with seat map config : %s',
+                         seatmap.dict())
+
+        # Static part of the analyst observation
+        self.observation_skeleton = template.observation_skeleton.copy(seatmap)
+
+        # Create total seat revenue
+        self.total_seat_revenue = self.CONFIG.RevenueInfo.TotalSeatRevenue
+        logger.debug(':money_with_wings: Initializing flight with total seat revenue : %s',
+                     self.total_seat_revenue)
+
+        self.seat_customer = template.seat_customer.fork(rng=make_rng(customer_seed),
+                                                         validate=validate)
+        if debug:
+            logger.debug(':leftwards_arrow_with_hook: Published customer hook: %s',
+                         self.seat_customer.observe().dict())
+
+        self.event_state = template.event_state.copy()
+        start = clock()
+        self.event_creator = EventCreator(
+            self.event_state, rng=make_rng(event_seed), validate=validate)
+        self.metrics.add('generate', clock() - start)
+        if debug:
+            logger.debug(':checkered_flag: Initializing event with event state : %s',
+                         self.event_state.dict())
 
         # Create an event
+        metrics = self.metrics
+        start = clock()
         spawn_info, is_valid = self.event_creator.tick()
+        metrics.add('tick', clock() - start)
         self.game_over = not is_valid
-        logger.debug(
-            ':game_die: Created event with state: {}'.format(spawn_info))
+        logger.debug(':game_die: Created event with state: %s', spawn_info)
 
-        if self.game_over:
-            logger.debug('Game over with context : {}'.format({
-                "FlightInformation": self.flight(),
-                "RequestUTCTimeStamp": spawn_info.Time,
-                "DepartureDate": self.CONFIG.ClockState.StopUTC
-            }))
+        if self.game_over and debug:
+            logger.debug('Game over with context : %s', self._game_over_context(spawn_info))
 
         # Spawn a customer
+        start = clock()
         self.customer_context = self.seat_customer.spawn(spawn_info=spawn_info)
-        logger.debug(':cat: Spawning a new customer with the context : {}'.format(
-            self.customer_context.dict()))
+        metrics.add('spawn', clock() - start)
+        if not self.game_over:
+            metrics.count('arrivals')
+        if debug:
+            logger.debug(':cat: Spawning a new customer with the context : %s',
+                         self.customer_context.dict())
+
+        if events_enabled():
+            emit_event('reset',
+                       FlightNumber=self.CONFIG.FlightInfo.Number,
+                       Demand=self.event_state.Demand,
+                       Time=spawn_info.Time,
+                       GameOver=self.game_over)
+
+    def _game_over_context(self, spawn_info):
+        return {
+            "FlightInformation": self.flight(),
+            "RequestUTCTimeStamp": spawn_info.Time,
+            "DepartureDate": self.CONFIG.ClockState.StopUTC
+        }
 
-    def transaction(self, customer_context: customer.SpawnContext) -> float:
+    @property
+    def customer_waiting(self) -> bool:
+        '''True if the spawned customer will be offered seats on
+        the next act'''
+        return (not self.game_over) and \
+            (self.flight.tickets >= self.customer_context.GroupSize) and \
+            self.event_creator.valid_customer
+
+    def transaction(self, customer_context: customer.SpawnContext,
+                    customer_actions: customer.Action = None) -> float:
         '''
         This function creates a transaction for customer
         purchase or no purchase. This function updates
@@ -85,6 +178,10 @@ class PricingGame:
         Args:
             customer_context (SpawnContext): 
                 Information about the spawned customer
+            customer_actions (Action):
+                Seats already selected by the customer (e.g. with
+                SeatCustomer_MNL.batch_action). The customer is
+                asked for an action if it is None.
 
         Return:
             seat_revenue (float) : seat revenue generated
@@ -102,33 +199,47 @@ class PricingGame:
             logger.debug(':purse: Customer purchasing flight tickets')
 
             # send observation to the customer and ask for action
-            customer_observation = self.customer_observation
-
-            customer_actions = self.seat_customer.action(customer_observation)
-            logger.debug(':credit_card: Customer responded with action : {}'.format(
-                customer_actions.dict()))
+            metrics = self.metrics
+            if customer_actions is None:
+                start = clock()
+                customer_observation = self.customer_observation
+                metrics.add('customer_observation', clock() - start)
+                start = clock()
+                customer_actions = self.seat_customer.action(
+                    customer_observation, features=self.flight.features)
+                metrics.add('customer_action', clock() - start)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(':credit_card: Customer responded with action : %s',
+                             customer_actions.dict())
 
             # One action is taken update the flight state
             seat_revenue = 0
 
+            if not customer_actions.Selected:
+                metrics.count('no_buys')
+
+            start = clock()
             for row, col in customer_actions.Selected:
                 single_seat_revenue = self.flight.sell_seat(row, col)
                 assert (not single_seat_revenue is None), 'Unable to process action'
                 seat_revenue += single_seat_revenue
-                logger.debug('Seat [{}, {}] sold for {}'.format(
-                    row, col, single_seat_revenue))
+                logger.debug('Seat [%s, %s] sold for %s',
+                             row, col, single_seat_revenue)
+            metrics.add('sell_seat', clock() - start)
 
             return seat_revenue
         else:
             return 0
 
-    def act(self, action: dict = {}) -> tuple:
+    def act(self, action: dict = {}, customer_actions: customer.Action = None) -> tuple:
         '''
         Pricing CLI action is to change the Zone
         price of the flight.
 
         Arg:
             action (dict): schema same as analyst.action
+            customer_actions (Action): seats already selected by the
+                waiting customer (see transaction)
 
         Return: 
             (game over, seat revenue)
@@ -136,41 +247,68 @@ class PricingGame:
 
         if (not self.game_over):
 
+            debug = logger.isEnabledFor(logging.DEBUG)
+            events = events_enabled()
+            if events:
+                request_time = self.event_creator.spawned_time
+                customer_type = self.seat_customer.customer.Name
+                sold = self.flight.ticket_sold
+
             # Update zone prices
             self.flight.zone_price = action
-            logger.info(':seat: Zone prices: {}'.format(
-                self.flight.zone_price))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(':seat: Zone prices: %s', self.flight.zone_price)
 
             # Do a complete transaction
             seat_revenue = self.transaction(
-                self.customer_context)
+                self.customer_context, customer_actions)
             logger.info(
-                ':money_with_wings: Seat revenue generated: {}'.format(seat_revenue))
+                ':money_with_wings: Seat revenue generated: %s', seat_revenue)
 
             # Update total seat revenue
             self.total_seat_revenue += seat_revenue
-            logger.debug(':moneybag: Flight total seat revenue : {}'.format(
-                self.total_seat_revenue))
+            logger.debug(':moneybag: Flight total seat revenue : %s',
+                         self.total_seat_revenue)
+
+            if events:
+                emit_event('step',
+                           Time=request_time,
+                           CustomerType=customer_type,
+                           Prices={zone.Name: zone.PriceRule.Price
+                                   for zone in self.flight.state.SeatMap.Zones},
+                           Tickets=self.flight.ticket_sold - sold,
+                           Revenue=seat_revenue,
+                           TotalRevenue=self.total_seat_revenue)
 
             # Create an event
+            metrics = self.metrics
+            start = clock()
             spawn_info, is_valid = self.event_creator.tick()
+            metrics.add('tick', clock() - start)
             self.game_over = not ((is_valid) and (self.flight.tickets > 0))
-            logger.debug(
-                ':game_die: Created event with state: {}'.format(spawn_info))
+            logger.debug(':game_die: Created event with state: %s', spawn_info)
 
             if not self.game_over:
                 # Spawn a customer
+                start = clock()
                 self.customer_context = self.seat_customer.spawn(
                     spawn_info=spawn_info)
-                logger.debug(':panda_face: Spawning a new customer with the context : {}'.format(
-                    self.customer_context.dict()))
+                metrics.add('spawn', clock() - start)
+                metrics.count('arrivals')
+                if debug:
+                    logger.debug(':panda_face: Spawning a new customer with the context : %s',
+                                 self.customer_context.dict())
 
             else:
-                logger.debug('Game over with context : {}'.format({
-                    "FlightInformation": self.flight(),
-                    "RequestUTCTimeStamp": spawn_info.Time,
-                    "DepartureDate": self.CONFIG.ClockState.StopUTC
-                }))
+                if self.flight.tickets == 0:
+                    metrics.count('sold_out')
+                if debug:
+                    logger.debug('Game over with context : %s',
+                                 self._game_over_context(spawn_info))
+                if events:
+                    emit_event('game_over',
+                               TotalRevenue=self.total_seat_revenue,
+                               TicketsSold=self.flight.ticket_sold)
 
             # return game status
             return self.game_over, seat_revenue
@@ -180,57 +318,29 @@ class PricingGame:
 
     @property
     def analyst_observation(self):
-        '''Returns '''
-
-        # Add Seat Grid to the observation
-        # state = self.flight.state.copy(deep=True)
-        state = self.flight.state
-        for row in state.Grid:
-            for seat in row:
-                seat.ZoneName = self.flight._seat_to_zonename(state, seat)
-                seat.Price = self.flight.zone_price[seat.ZoneName]['Price']
-
-        segment = analyst.Segment(FlightNumber=self.CONFIG.FlightInfo.Number,
-                                  CarrierCode=self.CONFIG.FlightInfo.CarrierCode,
-                                  DurationInSec=self.CONFIG.FlightInfo.DurationInSec,
-                                  DepartureAirport=self.CONFIG.FlightInfo.DepartureAirport,
-                                  ArrivalAirport=self.CONFIG.FlightInfo.ArrivalAirport,
-                                  SeatMap=self.CONFIG.SeatMap,
-                                  SegmentProducts=self.flight())
-
-        journey = analyst.Journey(OriginCityCode=self.CONFIG.FlightInfo.DepartureAirport,
-                                  DestinationCityCode=self.CONFIG.FlightInfo.ArrivalAirport,
-                                  OriginAirportCode=self.CONFIG.FlightInfo.DepartureAirport,
-                                  DestinationAirportCode=self.CONFIG.FlightInfo.ArrivalAirport,
-                                  DepartureDate=self.CONFIG.ClockState.StopUTC,
-                                  ArrivalDate=self.CONFIG.ClockState.StopUTC+self.CONFIG.FlightInfo.DurationInSec,
-                                  Segments=[segment]
-                                  )
-
-        req = analyst.Request(Journeys=[journey])
-
-        observation = analyst.Observation(RequestUTCTimeStamp=self.event_creator.spawned_time,
-                                          CurrencyCode="HKD",
-                                          Requests=[req],
-                                          Grid=state.Grid)
-        return observation
+        '''Analyst observation of the current state (LazyObservation).
+        The static parts come from the skeleton built with the game and
+        the pydantic models are only built when they are read.'''
+        return self.observation_skeleton.observation(self.event_creator.spawned_time,
+                                                     self.flight(),
+                                                     self.flight.grid.copy())
 
     @property
     def customer_observation(self):
 
-        Seats = []
-
-        # state = self.flight.state.copy(deep=True)
         state = self.flight.state
-        for row in state.Grid:
-            _s = []
-            for seat in row:
-                if seat.Available:
-                    _s.append(self.flight.zone_price[self.flight._seat_to_zonename(
-                        state, seat)]['Price'])
-                else:
-                    _s.append(-1*seat.Ghost)
-            Seats.append(_s)
+
+        if not self.validate:
+            # Seats stay an array, the customer reads it as one
+            return customer.Observation.construct(
+                Context=customer.FlightContext.construct(
+                    DepartureDatetimeUTC=self.CONFIG.ClockState.StopUTC),
+                Seats=self.flight.seat_prices(),
+                WindowCols=state.SeatMap.WindowCols,
+                AisleCols=state.SeatMap.AisleCols,
+                ExitRows=state.SeatMap.ExitRows)
+
+        Seats = self.flight.seat_prices().tolist()
 
         return customer.Observation(Context=customer.FlightContext(DepartureDatetimeUTC=self.CONFIG.ClockState.StopUTC),
                                     Seats=Seats,
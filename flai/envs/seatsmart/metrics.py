@@ -0,0 +1,130 @@
+import os
+import time
+
+# Monotonic clock of the phase timers
+clock = time.perf_counter
+
+
+class GameMetrics:
+    '''
+    Per phase timers and counters of SeatSmart games. A timer keeps the
+    number of calls and the total time (monotonic clock, seconds) of a
+    phase:
+
+        reset, step : SeatSmartEnv.reset / step
+        generate : arrival schedule of a new game (EventCreator)
+        tick : EventCreator.tick
+        spawn : SeatCustomer_MNL.spawn
+        customer_observation : PricingGame.customer_observation
+        customer_action : SeatCustomer_MNL.action (or batch_action)
+        sell_seat : Flight.sell_seat of the selected seats
+        analyst_observation : observation returned by the env
+
+    Counters:
+
+        episodes, steps : env resets and steps
+        arrivals : spawned customers
+        no_buys : customers that bought a ticket but no seat
+        sold_out : episodes ended because all the tickets are sold
+
+    One object can be shared by the games of an env so that it
+    accumulates over episodes. With a `tracer` (see Tracer), every timed
+    phase is also recorded as a span.
+
+    >> metrics = GameMetrics()
+    >> start = clock(); ...; metrics.add('tick', clock() - start)
+    >> metrics.snapshot()
+    '''
+
+    TIMERS = ('reset', 'step', 'generate', 'tick', 'spawn', 'customer_observation',
+              'customer_action', 'sell_seat', 'analyst_observation')
+    COUNTERS = ('episodes', 'steps', 'arrivals', 'no_buys', 'sold_out')
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self.clear()
+
+    def clear(self):
+        '''Resets all the timers and counters'''
+        self.seconds = dict.fromkeys(self.TIMERS, 0.)
+        self.calls = dict.fromkeys(self.TIMERS, 0)
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def add(self, name, seconds):
+        '''Adds one call of `seconds` to a timer. The call is taken to
+        end now.'''
+        self.seconds[name] += seconds
+        self.calls[name] += 1
+        if self.tracer is not None:
+            self.tracer.span(name, clock() - seconds, seconds)
+
+    def count(self, name, n=1):
+        '''Increments a counter'''
+        self.counters[name] += n
+
+    @classmethod
+    def merge(cls, metrics):
+        '''Sum of several GameMetrics (e.g. the games of a vector env)'''
+        merged = cls()
+        for m in metrics:
+            for key in m.seconds:
+                merged.seconds[key] = merged.seconds.get(key, 0.) + m.seconds[key]
+                merged.calls[key] = merged.calls.get(key, 0) + m.calls[key]
+            for key in m.counters:
+                merged.counters[key] = merged.counters.get(key, 0) + m.counters[key]
+        return merged
+
+    def snapshot(self):
+        '''Copy of the timers and counters.
+
+        Returns:
+            dict: {'timers': {name: {'calls', 'seconds', 'mean_us'}},
+                'counters': {name: value}}
+        '''
+        timers = {}
+        for key, seconds in self.seconds.items():
+            calls = self.calls[key]
+            timers[key] = {'calls': calls,
+                           'seconds': seconds,
+                           'mean_us': seconds / calls * 1e6 if calls else 0.}
+        return {'timers': timers, 'counters': dict(self.counters)}
+
+    def prometheus(self, prefix='seatsmart', labels=None):
+        '''Timers and counters in the Prometheus text exposition format.
+
+        Args:
+            prefix (str) : metric name prefix
+            labels (dict) : extra labels of every sample (e.g. worker id)
+
+        Returns:
+            str
+        '''
+        labels = labels or {}
+
+        def sample(name, value, **extra):
+            pairs = dict(labels, **extra)
+            label = ','.join('{}="{}"'.format(k, v) for k, v in pairs.items())
+            return '{}{} {!r}'.format(name, '{' + label + '}' if label else '', value)
+
+        lines = ['# HELP {}_phase_seconds_total Time spent per phase'.format(prefix),
+                 '# TYPE {}_phase_seconds_total counter'.format(prefix)]
+        lines += [sample(prefix + '_phase_seconds_total', float(self.seconds[key]), phase=key)
+                  for key in self.seconds]
+        lines += ['# HELP {}_phase_calls_total Calls per phase'.format(prefix),
+                  '# TYPE {}_phase_calls_total counter'.format(prefix)]
+        lines += [sample(prefix + '_phase_calls_total', self.calls[key], phase=key)
+                  for key in self.calls]
+        for key, value in self.counters.items():
+            name = '{}_{}_total'.format(prefix, key)
+            lines += ['# TYPE {} counter'.format(name), sample(name, value)]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='seatsmart', labels=None):
+        '''Writes the Prometheus text dump to a local file (e.g. for the
+        node exporter textfile collector). The file is replaced
+        atomically.'''
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus(prefix=prefix, labels=labels))
+        os.replace(tmp, path)
+        return path
@@ -8,6 +8,7 @@ class CustomerType(BaseModel):
     SpawnProba: float = 1
     ArrivalAlpha: float = 1
     ArrivalBeta: float = 1
+    ArrivalEngine: str = "Thinning"
     Parameters: Optional[dict]
 
     @validator('SpawnProba')
@@ -16,10 +17,29 @@ class CustomerType(BaseModel):
             raise ValueError('Invalid probability value : {}'.format(v))
         return v
 
+    @validator('ArrivalEngine')
+    def arrival_engine(cls, v):
+        if v not in ('Thinning', 'OrderStatistics'):
+            raise ValueError('Invalid arrival engine : {}'.format(v))
+        return v
+
     class Config:
         validate_assignment = True
 
 
+class MNLParameters(BaseModel):
+    beta_group_seat: List[float]
+    beta_price_sensitivity: float
+    beta_nobuy_sensitivity: float
+    beta_forward: float
+    beta_window: float
+    beta_aisle: float
+    beta_extra_legroom: float
+    beta_isolation: float
+    beta_constant: float
+    groupsize_probability: List[float] = [1.]
+
+
 class Configuration(BaseModel):
     CustomerTypes: List[CustomerType] = [CustomerType()]
     MetaInfo: Optional[dict]
@@ -1,5 +1,6 @@
 import datetime
-from pydantic import BaseModel, validator, root_validator
+import numpy as np
+from pydantic import BaseModel, PrivateAttr, validator, root_validator
 from typing import Optional, List
 
 from flai.envs.seatsmart.models.event import ClockState
@@ -97,39 +98,134 @@ class RevenueInfo(BaseModel):
     CurrencyCode: str = "HKD"
 
 
+class SeatView(Seat):
+    '''Read-only seat built from a SeatGrid. Changing the
+    view does not change the flight, use the SeatGrid arrays
+    (or Flight) instead.
+    '''
+
+    class Config:
+        allow_mutation = False
+
+
+class SeatGrid:
+    '''
+    Array backed seat grid of a flight. Every seat attribute is
+    stored as a (MaxRows, MaxCols) array instead of one Seat
+    object per cell:
+
+        available (bool) : seat can be sold
+        blocked (bool) : seat is blocked
+        ghost (bool) : seat does not exist
+        zone (int16) : index of the seat zone in SeatMap.Zones
+        price (float32) : current price of the seat
+
+    Zone index and price are assigned by the flight (zone_names
+    is None until then). A pydantic view of the grid is available
+    with `to_seats`.
+
+    >> grid = SeatGrid.from_seatmap(SeatMap())
+    '''
+
+    def __init__(self, rows, cols):
+        self.available = np.ones((rows, cols), dtype=bool)
+        self.blocked = np.zeros((rows, cols), dtype=bool)
+        self.ghost = np.zeros((rows, cols), dtype=bool)
+        self.zone = np.zeros((rows, cols), dtype=np.int16)
+        self.price = np.zeros((rows, cols), dtype=np.float32)
+        self.zone_names = None
+
+    @property
+    def shape(self):
+        return self.available.shape
+
+    @staticmethod
+    def _group_mask(group, rows, cols):
+        '''Boolean mask of the seats in a SeatGroup'''
+        mask = np.isin(np.arange(rows), group.Rows)[:, None] | \
+            np.isin(np.arange(cols), group.Cols)[None, :]
+        for _row, _col in group.Seats:
+            if (0 <= _row < rows) and (0 <= _col < cols):
+                mask[_row, _col] = True
+        return mask
+
+    @classmethod
+    def from_seatmap(cls, seatmap):
+        '''Creates a grid with all the seats available except
+        the ghost and blocked seats of the seat map.'''
+        grid = cls(seatmap.MaxRows, seatmap.MaxCols)
+        grid.ghost = cls._group_mask(
+            seatmap.Ghost, seatmap.MaxRows, seatmap.MaxCols)
+        grid.blocked = cls._group_mask(
+            seatmap.Blocked, seatmap.MaxRows, seatmap.MaxCols)
+        grid.available = ~(grid.ghost | grid.blocked)
+        return grid
+
+    @classmethod
+    def from_seats(cls, seats):
+        '''Creates a grid from a nested list of Seat objects'''
+        grid = cls(len(seats), len(seats[0]) if len(seats) else 0)
+        for row in seats:
+            for seat in row:
+                grid.available[seat.Row, seat.Col] = seat.Available
+                grid.blocked[seat.Row, seat.Col] = seat.Blocked
+                grid.ghost[seat.Row, seat.Col] = seat.Ghost
+                if seat.Price is not None:
+                    grid.price[seat.Row, seat.Col] = seat.Price
+        return grid
+
+    def copy(self):
+        grid = SeatGrid.__new__(SeatGrid)
+        grid.available = self.available.copy()
+        grid.blocked = self.blocked.copy()
+        grid.ghost = self.ghost.copy()
+        grid.zone = self.zone.copy()
+        grid.price = self.price.copy()
+        grid.zone_names = self.zone_names
+        return grid
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def seat(self, row, col):
+        '''Read-only pydantic view of a single seat'''
+        zone_name, price = None, None
+        if self.zone_names is not None:
+            zone_name = self.zone_names[self.zone[row, col]]
+            price = float(self.price[row, col])
+        return SeatView.construct(Available=bool(self.available[row, col]),
+                                  Blocked=bool(self.blocked[row, col]),
+                                  Ghost=bool(self.ghost[row, col]),
+                                  Row=row, Col=col,
+                                  Price=price, ZoneName=zone_name)
+
+    def to_seats(self):
+        '''Read-only pydantic view of the grid (List[List[Seat]])'''
+        rows, cols = self.shape
+        return [[self.seat(_row, _col) for _col in range(cols)] for _row in range(rows)]
+
+
 class FlightBaseState(BaseModel):
     SeatMap: SeatMap
     FlightInfo: FlightInfo
-    Grid: List[List[Seat]] = None
-
-    @ root_validator
-    def grid_generator(cls, values):
-        if values['Grid'] is None:
-            seatmap = values['SeatMap']
-            rl = []
-            for _row in range(seatmap.MaxRows):
-                cl = []
-                for _col in range(seatmap.MaxCols):
-                    # create a seat
-                    seat = Seat(Row=_row, Col=_col)
-
-                    # Ghost
-                    if (_row in seatmap.Ghost.Rows) or \
-                        (_col in seatmap.Ghost.Cols) or \
-                            ((_row, _col) in seatmap.Ghost.Seats):
-                        seat.Ghost = True
-                        seat.Available = False
-
-                    # Blocked
-                    if (_row in seatmap.Blocked.Rows) or \
-                        (_col in seatmap.Blocked.Cols) or \
-                            ((_row, _col) in seatmap.Blocked.Seats):
-                        seat.Blocked = True
-                        seat.Available = False
-                    cl.append(seat)
-                rl.append(cl)
-            values['Grid'] = rl
-        return values
+    _seat_grid: SeatGrid = PrivateAttr()
+
+    def __init__(self, Grid: List[List[Seat]] = None, **data):
+        super().__init__(**data)
+        if Grid is None:
+            self._seat_grid = SeatGrid.from_seatmap(self.SeatMap)
+        else:
+            self._seat_grid = SeatGrid.from_seats(Grid)
+
+    @property
+    def seat_grid(self):
+        '''Array backed seat grid (SeatGrid)'''
+        return self._seat_grid
+
+    @property
+    def Grid(self):
+        '''Read-only pydantic view of the seat grid'''
+        return self._seat_grid.to_seats()
 
 
 class GameState(BaseModel):
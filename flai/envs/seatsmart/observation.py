@@ -0,0 +1,151 @@
+import copy
+import numpy as np
+from flai.envs.seatsmart.models import analyst
+
+
+class ObservationSkeleton:
+    '''
+    Static part of the analyst observation of a game (flight, journey
+    and seat map information). It is validated once when the game is
+    created, and every step only adds the parts that change (see
+    LazyObservation).
+
+    Args:
+        config (GameState) : configuration of the game
+        currency_code (str) : currency of the prices
+
+    >> skeleton = ObservationSkeleton(GameState())
+    '''
+
+    def __init__(self, config, currency_code="HKD"):
+        info = config.FlightInfo
+        segment = analyst.Segment(FlightNumber=info.Number,
+                                  CarrierCode=info.CarrierCode,
+                                  DurationInSec=info.DurationInSec,
+                                  DepartureAirport=info.DepartureAirport,
+                                  ArrivalAirport=info.ArrivalAirport,
+                                  SeatMap=config.SeatMap,
+                                  SegmentProducts=[])
+        journey = analyst.Journey(OriginCityCode=info.DepartureAirport,
+                                  DestinationCityCode=info.ArrivalAirport,
+                                  OriginAirportCode=info.DepartureAirport,
+                                  DestinationAirportCode=info.ArrivalAirport,
+                                  DepartureDate=config.ClockState.StopUTC,
+                                  ArrivalDate=config.ClockState.StopUTC+info.DurationInSec,
+                                  Segments=[])
+        request = analyst.Request(Journeys=[])
+
+        self.currency_code = currency_code
+        self.segment = self._fields(segment, exclude='SegmentProducts')
+        self.journey = self._fields(journey, exclude='Segments')
+        self.request = self._fields(request, exclude='Journeys')
+
+    def copy(self, seatmap=None):
+        '''Copy of the skeleton, optionally with another seat map in
+        the segment (e.g. the seat map of a game built from a template)'''
+        skeleton = copy.copy(self)
+        skeleton.segment = dict(self.segment)
+        if seatmap is not None:
+            skeleton.segment['SeatMap'] = seatmap
+        return skeleton
+
+    @staticmethod
+    def _fields(model, exclude):
+        return {key: getattr(model, key) for key in model.__fields__ if key != exclude}
+
+    def observation(self, timestamp, products, grid):
+        '''Lazy observation of a game state.
+
+        Args:
+            timestamp (datetime) : request time
+            products (list) : segment products as dicts (see Flight.__call__)
+            grid (SeatGrid) : seat grid snapshot
+
+        Returns:
+            LazyObservation
+        '''
+        return LazyObservation(self, timestamp, products, grid)
+
+    def materialize(self, timestamp, products, grid):
+        '''Builds the pydantic analyst.Observation. The static parts were
+        validated with the skeleton and are not validated again.'''
+        segment = analyst.Segment.construct(
+            **self.segment,
+            SegmentProducts=[analyst.SegmentProduct(**product) for product in products])
+        journey = analyst.Journey.construct(**self.journey, Segments=[segment])
+        request = analyst.Request.construct(**self.request, Journeys=[journey])
+        return analyst.Observation.construct(RequestUTCTimeStamp=timestamp,
+                                             CurrencyCode=self.currency_code,
+                                             Requests=[request],
+                                             Grid=grid.to_seats())
+
+
+class LazyObservation:
+    '''
+    Analyst observation of one step of a game. The numeric parts are
+    available without pydantic:
+
+        products (list) : segment products as dicts
+        seat_grid (SeatGrid) : snapshot of the seat grid arrays
+        seat_prices (np.array) : price matrix as seen by a customer
+
+    The pydantic models (Requests, Grid, dict(), json(), ...) are built
+    on first access, so agents that read only the numeric parts do not
+    pay for them. The observation is a snapshot, later steps of the game
+    do not change it.
+
+    This is the observation type of SeatSmartEnv (its observation_space
+    when not encoded). It is not an analyst.Observation instance, use
+    `materialize()` where the pydantic model itself is required.
+
+    >> observation = game.analyst_observation
+    >> observation.products, observation.Requests
+    '''
+
+    def __init__(self, skeleton, timestamp, products, grid):
+        self._skeleton = skeleton
+        self._observation = None
+        self.RequestUTCTimeStamp = timestamp
+        self.CurrencyCode = skeleton.currency_code
+        self.products = products
+        self.seat_grid = grid
+
+    @property
+    def seat_prices(self):
+        '''Price matrix: seat price for available seats, -1 for ghost
+        seats and 0 otherwise (see Flight.seat_prices)'''
+        grid = self.seat_grid
+        prices = np.array([product['Price']
+                           for product in self.products], dtype=np.float64)
+        return np.where(grid.available, prices[grid.zone], -1.0 * grid.ghost)
+
+    def materialize(self):
+        '''The pydantic analyst.Observation (built once)'''
+        if self._observation is None:
+            self._observation = self._skeleton.materialize(
+                self.RequestUTCTimeStamp, self.products, self.seat_grid)
+        return self._observation
+
+    @property
+    def Requests(self):
+        return self.materialize().Requests
+
+    @property
+    def Grid(self):
+        return self.materialize().Grid
+
+    def dict(self, **kwargs):
+        return self.materialize().dict(**kwargs)
+
+    def json(self, **kwargs):
+        return self.materialize().json(**kwargs)
+
+    def __getattr__(self, name):
+        # Everything else is served by the pydantic observation
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __repr__(self):
+        return 'LazyObservation(RequestUTCTimeStamp={!r}, products={!r})'.format(
+            self.RequestUTCTimeStamp, self.products)
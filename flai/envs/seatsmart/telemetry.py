@@ -0,0 +1,61 @@
+import json
+import logging
+
+# Structured event channel of the games. It does not propagate to the
+# SeatSmart logger (and its console handler) and is off until enabled.
+event_logger = logging.getLogger('SeatSmart.events')
+event_logger.propagate = False
+event_logger.setLevel(logging.CRITICAL + 1)
+
+
+class JSONFormatter(logging.Formatter):
+    '''Formats the records of the event channel as one JSON object per
+    line: {"event": name, "created": unix time, **fields}'''
+
+    def format(self, record):
+        payload = {'event': record.getMessage(), 'created': record.created}
+        payload.update(getattr(record, 'fields', {}))
+        return json.dumps(payload, default=str)
+
+
+def events_enabled():
+    '''True if the event channel is on. Callers check it before
+    building an event payload.'''
+    return event_logger.isEnabledFor(logging.INFO)
+
+
+def emit_event(name, **fields):
+    '''Emits a structured event (see enable_events)'''
+    event_logger.info(name, extra={'fields': fields})
+
+
+def enable_events(handler=None):
+    '''Turns the structured event channel on. The games then emit a
+    `reset`, a `step` and a `game_over` event with their numeric
+    payload.
+
+    Args:
+        handler (logging.Handler) : destination of the events (default:
+            JSON lines on stderr). Handlers without a formatter get the
+            JSONFormatter.
+
+    Returns:
+        logging.Handler: the attached handler
+
+    Example :
+        enable_events(logging.FileHandler('events.jsonl'))
+    '''
+    if handler is None:
+        handler = logging.StreamHandler()
+    if handler.formatter is None:
+        handler.setFormatter(JSONFormatter())
+    event_logger.addHandler(handler)
+    event_logger.setLevel(logging.INFO)
+    return handler
+
+
+def disable_events():
+    '''Turns the structured event channel off and detaches its handlers'''
+    event_logger.setLevel(logging.CRITICAL + 1)
+    for handler in list(event_logger.handlers):
+        event_logger.removeHandler(handler)
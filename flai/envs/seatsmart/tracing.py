@@ -0,0 +1,80 @@
+from collections import deque
+import json
+import os
+import threading
+
+
+class Tracer:
+    '''
+    Bounded in memory ring of timed spans, exported in the Chrome
+    trace event format (chrome://tracing, Perfetto). Only the last
+    `capacity` spans are kept so tracing can stay on in long jobs.
+
+    A GameMetrics with a tracer records a span for every timed phase
+    (reset, step, generate, tick, spawn, customer actions, ...), see
+    SeatSmartEnv(tracer=...). Span times come from the monotonic clock
+    of the metrics, which is shared by the processes of a machine, so
+    the traces of several workers line up on one timeline.
+
+    Args:
+        capacity (int) : maximum number of kept spans
+        pid (int) : process id of the trace (default: os.getpid(), e.g.
+            a worker index)
+        name (str) : process name shown by the viewer
+
+    >> tracer = Tracer(capacity=100000)
+    >> env = SeatSmartEnv(tracer=tracer)
+    >> ...
+    >> tracer.export('episode.trace.json')
+    '''
+
+    def __init__(self, capacity: int = 100000, pid: int = None, name: str = None):
+        self.spans = deque(maxlen=capacity)
+        self.pid = os.getpid() if pid is None else pid
+        self.name = name
+
+    def span(self, name, start, seconds):
+        '''Records a span of `seconds` started at `start` (seconds of
+        the monotonic clock)'''
+        self.spans.append((name, start, seconds, threading.get_ident()))
+
+    def clear(self):
+        '''Drops the recorded spans'''
+        self.spans.clear()
+
+    def events(self):
+        '''Recorded spans as Chrome trace events (complete events with
+        microsecond timestamps)'''
+        events = []
+        if self.name is not None:
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                           'args': {'name': self.name}})
+        for name, start, seconds, tid in list(self.spans):
+            events.append({'name': name, 'cat': 'seatsmart', 'ph': 'X',
+                           'ts': start * 1e6, 'dur': seconds * 1e6,
+                           'pid': self.pid, 'tid': tid})
+        return events
+
+    def export(self, path):
+        '''Writes the trace to a JSON file (see write_chrome_trace)'''
+        return write_chrome_trace(path, [self])
+
+
+def write_chrome_trace(path, traces):
+    '''Writes several traces into one Chrome trace JSON file, e.g. the
+    tracers of the workers of a vector run.
+
+    Args:
+        path (str) : output file
+        traces (list) : Tracer objects or lists of trace events
+            (Tracer.events)
+
+    Returns:
+        str: path
+    '''
+    events = []
+    for trace in traces:
+        events.extend(trace.events() if isinstance(trace, Tracer) else trace)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return path
@@ -0,0 +1,160 @@
+from flai.envs.seatsmart_env import SeatSmartEnv
+from flai.utils import spawn
+import asyncio
+import inspect
+import logging
+logger = logging.getLogger('SeatSmart')
+
+
+class AsyncVectorSeatSmartEnv:
+    """Asyncio runner of `num_envs` SeatSmart flights for agent servers.
+    Every flight loops on its own: the policy picks an action from the
+    last observation, the env steps in `executor` and the transition is
+    queued for the consumer. While the steps of some flights run in the
+    executor, the event loop runs the policy of the other flights.
+
+    Backpressure:
+        max_in_flight : maximum number of env steps and resets running
+            in the executor at the same time (default: num_envs)
+        queue_size : maximum number of transitions waiting for the
+            consumer (default: num_envs). Flights stop stepping while
+            the queue is full.
+
+    The policy is called as `policy(index, observation)` and returns
+    an action dict (see SeatSmartEnv.action_space) or an awaitable of
+    one. Finished episodes are reset automatically and the episode score
+    is reported in the info of the last transition. `validate` is passed
+    to the flights (see SeatSmartEnv).
+
+    Example :
+        env = AsyncVectorSeatSmartEnv(num_envs=16, max_in_flight=4)
+        env.seed(7)
+
+        async def policy(index, observation):
+            return await agent.price(observation)
+
+        async for index, observation, reward, done, info in env.run(policy, steps=10000):
+            ...
+    """
+
+    def __init__(self,
+                 num_envs: int = 1,
+                 config_path: str = None,
+                 max_in_flight: int = None,
+                 queue_size: int = None,
+                 executor=None,
+                 validate: bool = True):
+
+        assert num_envs > 0, 'num_envs should be positive but it is {}'.format(
+            num_envs)
+        self.num_envs = num_envs
+        self.envs = [SeatSmartEnv(config_path=config_path, validate=validate)
+                     for _ in range(num_envs)]
+        self.max_in_flight = max_in_flight or num_envs
+        self.queue_size = queue_size or num_envs
+        self.executor = executor
+
+    def seed(self, seed=None):
+        """To set the seed of the flights. Flight i is seeded with the
+        i-th child SeedSequence of the seed (see seeding.spawn).
+
+        Args:
+            seed (int/SeedSequence) : Random seed value for controlled experiments
+        """
+        if seed is not None:
+            for env, child in zip(self.envs, spawn(seed, self.num_envs)):
+                env.seed(child)
+
+    async def reset(self, slots=None):
+        """To reset all the flights, at most `max_in_flight` at a time.
+
+        Args:
+            slots (Semaphore) : executor slots (default: a new semaphore
+                of `max_in_flight` slots)
+
+        Returns:
+            list: first observation of every flight
+        """
+        slots = slots or asyncio.Semaphore(self.max_in_flight)
+        return list(await asyncio.gather(
+            *(self._reset(env, slots) for env in self.envs)))
+
+    async def _reset(self, env, slots):
+        """Resets one flight in the executor"""
+        async with slots:
+            return await env.async_reset(self.executor)
+
+    async def _flight(self, index, observation, policy, slots, queue, budget):
+        """Policy / step loop of one flight"""
+        env = self.envs[index]
+        while budget[0] > 0:
+            budget[0] -= 1
+
+            action = policy(index, observation)
+            if inspect.isawaitable(action):
+                action = await action
+
+            async with slots:
+                observation, reward, done, info = await env.async_step(
+                    action, self.executor)
+
+            info = {'Score': env._score} if done else {}
+            await queue.put((index, observation, reward, done, info))
+
+            if done:
+                observation = await self._reset(env, slots)
+
+    async def run(self, policy, steps):
+        """Resets the flights and runs the policy for `steps` steps in
+        total.
+
+        Args:
+            policy (callable) : policy(index, observation) -> action
+            steps (int) : total number of steps over all the flights
+
+        Yields:
+            (index, observation, reward, done, info) transitions in
+            completion order
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        slots = asyncio.Semaphore(self.max_in_flight)
+        budget = [steps]
+
+        observations = await self.reset(slots)
+        tasks = [asyncio.ensure_future(self._flight(index, observation, policy,
+                                                    slots, queue, budget))
+                 for index, observation in enumerate(observations)]
+        finished = asyncio.gather(*tasks)
+
+        try:
+            received = 0
+            while received < steps:
+                if not queue.empty():
+                    received += 1
+                    yield queue.get_nowait()
+                    continue
+
+                if finished.done():
+                    # Re-raises the error of a failed flight
+                    finished.result()
+                    break
+
+                get = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({get, finished},
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if get in done:
+                    received += 1
+                    yield get.result()
+                else:
+                    get.cancel()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        """To close the flights.
+        Check ENV for more documentations
+        """
+        for env in self.envs:
+            env.close()
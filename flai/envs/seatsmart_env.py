@@ -1,7 +1,11 @@
-from flai.envs.seatsmart.models.analyst import Observation
-from flai.envs.seatsmart.game import PricingGame
-from flai.utils import np_random
+from flai.envs.seatsmart.observation import LazyObservation
+from flai.envs.seatsmart.game import PricingGame, GameTemplate
+from flai.envs.seatsmart.encoder import ObservationEncoder
+from flai.envs.seatsmart.metrics import GameMetrics, clock
+from flai.envs.seatsmart.tracing import Tracer
+from flai.utils import np_random, seed_sequence, make_rng, EpisodeProfiler, seed_label
 from flai import Env
+import asyncio
 import yaml
 import json
 import logging
@@ -10,21 +14,22 @@ logger = logging.getLogger('SeatSmart')
 
 class ActionSpace:
 
-    def __init__(self, zone_price):
+    def __init__(self, zone_price, rng=None):
         self.zone_price = zone_price
+        self.rng = np_random.rng if rng is None else rng
 
     def sample(self, seed=None):
         """Sample an action from the action space.
 
         Args:
-            seed (int) : seed to control randomness
-
-        Note: Seed functionality is not implemented right now
+            seed (int) : seed to control randomness (default: draw
+                from the action space Generator)
         """
+        rng = self.rng if seed is None else make_rng(seed)
         _action = {}
         for key, val in self.zone_price.items():
-            _action[key] = np_random.rng.randint(low=val['MinPrice'],
-                                                 high=val['MaxPrice'])
+            _action[key] = int(rng.integers(low=val['MinPrice'],
+                                            high=val['MaxPrice']))
         return _action
 
     def __contains__(self, x: dict):
@@ -55,28 +60,101 @@ class SeatSmartEnv(Env):
     This environment can run on modes:
     Available modes : None
 
+    With `encoded`, observations are fixed shape float32 vectors (see
+    ObservationEncoder) written into `observation_buffer`, which can be
+    replaced by a caller supplied buffer of the observation space.
+
+    With `validate=False` the per step pydantic models are built
+    without validation (see PricingGame). The config is still validated
+    when it is loaded and the zone prices of every action are still
+    checked against their bounds.
+
+    The config is validated and compiled once into a GameTemplate, so
+    a reset only copies the mutable state of the flight and draws a new
+    arrival schedule.
+
+    `metrics` (GameMetrics) accumulates the phase timers and counters
+    of the env and of its games over all the episodes, e.g.
+    `env.metrics.snapshot()` or `env.metrics.write_prometheus(path)`.
+
+    With `profile_every=N`, every N-th episode (from its reset to its
+    last step) is profiled with cProfile and written to `profile_dir` as
+    a .pstats file named by the env seed and the episode number (see
+    EpisodeProfiler, merge_stats). Open them with snakeviz. With the
+    async API the profile records the steps and resets run in the
+    executor threads (see async_step).
+
+    With a `tracer`, the timed phases of the env and of its games are
+    recorded as spans for a Chrome trace (see Tracer).
+
     Example :
         env = SeatSmartEnv(mode="U0_A321")
     """
 
     def __init__(self,
-                 config_path: str = None):
+                 config_path: str = None,
+                 encoded: bool = False,
+                 validate: bool = True,
+                 profile_every: int = None,
+                 profile_dir: str = 'profiles',
+                 tracer: Tracer = None):
 
         self.config = {}
         if not config_path is None:
             with open(config_path) as f:
                 self.config = yaml.load(f, Loader=yaml.FullLoader)
-            logger.debug('Loading configuration: {}'.format(self.config))
+            logger.debug('Loading configuration: %s', self.config)
+
+        self.seed_sequence = None
+        self.seed()
+
+        self.encoded = encoded
+        self.validate = validate
+        self.template = GameTemplate(self.config)
+        self.encoder = ObservationEncoder(self.template.CONFIG.SeatMap)
+        self._observation_buffer = None
+        self.metrics = GameMetrics(tracer=tracer)
+
+        self._episode = -1
+        self.profiler = None
+        if profile_every:
+            self.profiler = EpisodeProfiler(every=profile_every,
+                                            directory=profile_dir)
 
     @property
     def observation_space(self):
         """Observation Space variable to extend ENV
 
-        Returns: ObservationSpace object for analyst
-        from the game.
+        Returns: LazyObservation, the type of the analyst observations
+        returned by step and reset (its `materialize()` builds the pydantic
+        analyst.Observation), or the Box of the encoded observation.
         """
+        if self.encoded:
+            return self.encoder.observation_space
+        return LazyObservation
 
-        return Observation
+    @property
+    def observation_buffer(self):
+        """Preallocated buffer of the encoded observations"""
+        if self._observation_buffer is None:
+            self._observation_buffer = self.encoder.observation_space.zeros()
+        return self._observation_buffer
+
+    @observation_buffer.setter
+    def observation_buffer(self, out):
+        space = self.encoder.observation_space
+        assert out.shape == space.shape and out.dtype == space.dtype, \
+            'Observation buffer should be a {} array'.format(space)
+        self._observation_buffer = out
+
+    def _observation(self):
+        start = clock()
+        if self.encoded:
+            observation = self.encoder.encode(self.game, out=self.observation_buffer)
+        else:
+            observation = self.game.analyst_observation
+        self.metrics.add('analyst_observation', clock() - start)
+        return observation
 
     @property
     def action_space(self):
@@ -86,7 +164,7 @@ class SeatSmartEnv(Env):
         from the game.
         """
         # TODO
-        return ActionSpace(self.game.flight.zone_price)
+        return ActionSpace(self.game.flight.zone_price, rng=self.rng)
 
     def render(self, mode='human'):
         """Renders the environment. Check ENV for
@@ -99,12 +177,13 @@ class SeatSmartEnv(Env):
         """To take a step in the environment.
         Check ENV for more documentations
         """
+        start = clock()
 
         # Perform action in the game
         done, rev = self.game.act(action) or self.quit
 
         # Get the observations from the game
-        observation = self.game.analyst_observation
+        observation = self._observation()
 
         # Setting up the reward
         self._score += rev
@@ -113,33 +192,83 @@ class SeatSmartEnv(Env):
         # Information (Aux)
         info = None
 
+        self.metrics.count('steps')
+        self.metrics.add('step', clock() - start)
+
+        if done and (self.profiler is not None):
+            self.profiler.stop()
         return observation, reward, done, info
 
     def reset(self):
         """To reset the environment.
         Check ENV for more documentations
         """
+        self._episode += 1
+        if self.profiler is not None:
+            self.profiler.start(self._episode, seed_label(self.seed_sequence))
+        start = clock()
 
         # Create an instance of the Game class
-        self.game = PricingGame(config=self.config)
+        self.game = PricingGame(seed=self.seed_sequence.spawn(1)[0],
+                                validate=self.validate,
+                                metrics=self.metrics,
+                                template=self.template)
 
         # Tracking Score (Private Variable)
         self._score = 0
 
-        return self.game.analyst_observation
+        observation = self._observation()
+        self.metrics.count('episodes')
+        self.metrics.add('reset', clock() - start)
+        return observation
+
+    def _executor_call(self, func, *args):
+        """Runs func in an executor thread. A running episode profile
+        is enabled on that thread for the duration of the call only."""
+        if self.profiler is None:
+            return func(*args)
+        self.profiler.resume()
+        try:
+            return func(*args)
+        finally:
+            self.profiler.pause()
+
+    async def async_step(self, action, executor=None):
+        """Asyncio variant of step. The step runs in `executor`
+        (default: the event loop default executor) so the event loop
+        keeps serving other coroutines meanwhile. An env must not be
+        stepped or reset concurrently with itself. Profiled episodes
+        (see `profile_every`) record the steps and resets run in the
+        executor, not the time spent between them.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self._executor_call, self.step, action)
+
+    async def async_reset(self, executor=None):
+        """Asyncio variant of reset (see async_step).
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self._executor_call, self.reset)
 
     def seed(self, seed=None):
-        """To set the seed in the game.
+        """To set the seed of the environment. Every reset spawns the
+        seed of the new game from it (see PricingGame), and the action
+        space samples from a Generator spawned from it. The seed applies
+        from the next reset.
 
         Args:
-            seed (int) : Random seed value for controlled experiments
+            seed (int/SeedSequence) : Random seed value for controlled
+                experiments (e.g. a child of seeding.spawn for a worker).
+                A fresh OS entropy seed is used the first time if it is None.
         """
-        if seed is not None:
-            np_random.rng.seed([seed])
+        if (seed is None) and (self.seed_sequence is not None):
+            return
+        self.seed_sequence = seed_sequence(seed)
+        self.rng = make_rng(self.seed_sequence.spawn(1)[0])
 
     def close(self):
         """To close the environment.
         Check ENV for more documentations
         """
-
-        pass
+        if self.profiler is not None:
+            self.profiler.stop()
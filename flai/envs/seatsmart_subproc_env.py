@@ -0,0 +1,396 @@
+from flai.envs.seatsmart_env import SeatSmartEnv
+from flai.envs.seatsmart_vector_env import observation_shapes, write_observation
+from flai.envs.seatsmart.models.flight import GameState
+from flai.envs.seatsmart.tracing import Tracer, write_chrome_trace
+from flai.utils import spawn
+from flai import Env
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import multiprocessing as mp
+import traceback
+import numpy as np
+import yaml
+import logging
+logger = logging.getLogger('SeatSmart')
+
+
+class SharedArrays:
+    """Named NumPy arrays backed by `multiprocessing.shared_memory`
+    blocks, so worker processes can write results that the main
+    process reads without pickling.
+
+    Args:
+        specs (dict) : name -> (shape, dtype)
+        names (dict) : name -> shared memory block name, to attach to
+            existing blocks instead of creating new ones
+    """
+
+    def __init__(self, specs, names=None):
+        self.specs = specs
+        self.owner = names is None
+        self._blocks = {}
+        self.arrays = {}
+        for key, (shape, dtype) in specs.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            if self.owner:
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=names[key])
+            self._blocks[key] = block
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            if self.owner:
+                self.arrays[key][...] = 0
+
+    @property
+    def names(self):
+        return {key: block.name for key, block in self._blocks.items()}
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        """Releases the blocks (and frees them in the owner process)."""
+        self.arrays = {}
+        for block in self._blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self._blocks = {}
+
+
+def _worker(index, config_path, validate, profile_every, profile_dir,
+            trace_capacity, specs, names, pipe, parent_pipe):
+    """Hosts one SeatSmartEnv and writes its observation, reward and
+    done flag into row `index` of the shared arrays. Every command is
+    answered with ('ok', result), or ('error', traceback) when it
+    raised; the worker keeps serving commands after an error."""
+    if parent_pipe is not None:
+        parent_pipe.close()
+    shared = SharedArrays(specs, names)
+    tracer = None
+    if trace_capacity:
+        tracer = Tracer(capacity=trace_capacity, pid=index,
+                        name='worker {}'.format(index))
+    env = SeatSmartEnv(config_path=config_path, validate=validate,
+                       profile_every=profile_every, profile_dir=profile_dir,
+                       tracer=tracer)
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == 'close':
+                break
+            try:
+                result = None
+                if command == 'step':
+                    _, reward, done, _ = env.step(data)
+                    result = {}
+                    if done:
+                        result['Score'] = env._score
+                        env.reset()
+                    write_observation(env.game, index, shared)
+                    shared['Rewards'][index] = reward
+                    shared['Dones'][index] = done
+                elif command == 'reset':
+                    env.reset()
+                    write_observation(env.game, index, shared)
+                    shared['Rewards'][index] = 0
+                    shared['Dones'][index] = False
+                elif command == 'seed':
+                    env.seed(data[index])
+                elif command == 'metrics':
+                    result = env.metrics
+                elif command == 'trace':
+                    result = tracer.events() if tracer is not None else []
+            except Exception:
+                pipe.send(('error', traceback.format_exc()))
+            else:
+                pipe.send(('ok', result))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env.close()
+        shared.close()
+        pipe.close()
+
+
+class SubprocVectorSeatSmartEnv(Env):
+    """Multi-process SeatSmart environment. Every flight runs a
+    SeatSmartEnv in its own worker process, and the workers write
+    observations, rewards and done flags into shared memory arrays
+    instead of sending pydantic observations back through pipes.
+
+    Actions and observations follow VectorSeatSmartEnv: actions are a
+    (num_envs, n_zones) price array and observations a dict of stacked
+    Seats, Products and TimeToDeparture arrays. Finished episodes are
+    reset automatically in the worker.
+
+    `step` steps all the flights and waits for all of them. The
+    `barrier` only applies to the explicit `step_async` / `step_wait`
+    path: `step_wait` returns once at least `barrier` of the pending
+    workers are done (all of them by default). The other workers keep
+    running and are listed in `pending`, and their info is
+    {'Pending': True}. They keep writing their rows of the shared arrays
+    (observation, reward and done) after `step_wait` returns, so these
+    rows must not be read until the worker is done (a later `step_wait`).
+    `step_async` can be called with the indices of the idle workers to
+    keep the rest of the fleet running. `step` refuses to run while
+    workers are pending.
+
+    An exception in a worker (e.g. a price out of its bounds) is raised
+    in the main process as a RuntimeError naming the worker and holding
+    its traceback. The other workers of the call are collected first,
+    so none is left pending.
+
+    `profile_every` and `profile_dir` are passed to the workers (see
+    SeatSmartEnv); merge their profiles with flai.utils.merge_stats.
+    With `trace_capacity`, every worker records the last
+    `trace_capacity` spans of its env (see Tracer) and `export_trace`
+    writes them into one Chrome trace, one process per worker.
+
+    The returned arrays are views of the shared memory, copy them if
+    they must outlive the next step. `validate` is passed to the
+    workers (see SeatSmartEnv).
+
+    Example :
+        env = SubprocVectorSeatSmartEnv(num_envs=32, barrier=24)
+        observation = env.reset()
+        observation, reward, done, info = env.step(actions)
+        env.close()
+    """
+
+    def __init__(self,
+                 num_envs: int = 1,
+                 config_path: str = None,
+                 barrier: int = None,
+                 context: str = None,
+                 validate: bool = True,
+                 profile_every: int = None,
+                 profile_dir: str = 'profiles',
+                 trace_capacity: int = None):
+
+        assert num_envs > 0, 'num_envs should be positive but it is {}'.format(
+            num_envs)
+        self.num_envs = num_envs
+        self.barrier = barrier
+
+        config = {}
+        if not config_path is None:
+            with open(config_path) as f:
+                config = yaml.load(f, Loader=yaml.FullLoader)
+        seatmap = GameState(**config).SeatMap
+        self.zone_names = [zone.Name for zone in seatmap.Zones]
+
+        specs = observation_shapes(seatmap, num_envs)
+        specs['Rewards'] = ((num_envs,), np.float64)
+        specs['Dones'] = ((num_envs,), np.bool_)
+        self._shared = SharedArrays(specs)
+
+        ctx = mp.get_context(context)
+        self._pipes, self._processes = [], []
+        for index in range(num_envs):
+            parent_pipe, child_pipe = ctx.Pipe()
+            process = ctx.Process(target=_worker,
+                                  args=(index, config_path, validate,
+                                        profile_every, profile_dir, trace_capacity,
+                                        specs, self._shared.names,
+                                        child_pipe, parent_pipe),
+                                  daemon=True)
+            process.start()
+            child_pipe.close()
+            self._pipes.append(parent_pipe)
+            self._processes.append(process)
+
+        self._pending = set()
+        self.closed = False
+
+    @property
+    def pending(self):
+        """Indices of the workers that are still stepping"""
+        return sorted(self._pending)
+
+    @property
+    def observation(self):
+        """Stacked observation of all the flights (shared memory views)"""
+        return {key: self._shared[key] for key in ('Seats', 'Products', 'TimeToDeparture')}
+
+    @property
+    def observation_space(self):
+        """Observation Space variable to extend ENV
+
+        Returns: shapes of the stacked observation arrays
+        """
+        return {key: value.shape for key, value in self.observation.items()}
+
+    @property
+    def action_space(self):
+        """Action Space Varirable to extend ENV
+
+        Returns: (n_zones, ) zone names, the columns of the actions
+        """
+        return self.zone_names
+
+    def render(self, mode='human'):
+        """Renders the environment. Check ENV for
+        more documentations.
+        """
+        pass
+
+    def _call(self, command, data=None):
+        """Sends a command to all the workers and waits for them"""
+        assert not self._pending, 'Workers {} are still stepping'.format(
+            self.pending)
+        for pipe in self._pipes:
+            pipe.send((command, data))
+        replies = [pipe.recv() for pipe in self._pipes]
+        self._raise_errors(command, replies)
+        return [result for _, result in replies]
+
+    @staticmethod
+    def _raise_errors(command, replies):
+        """Raises a RuntimeError for the first worker that failed"""
+        for index, (status, result) in enumerate(replies):
+            if status == 'error':
+                raise RuntimeError('Worker {} failed on {}:\n{}'.format(
+                    index, command, result))
+
+    def step_async(self, actions, indices=None):
+        """Sends the actions to the workers without waiting.
+
+        Args:
+            actions (np.array) : (num_envs, n_zones) or (len(indices), n_zones)
+                zone prices
+            indices (list) : workers to step (default: all)
+        """
+        indices = range(self.num_envs) if indices is None else indices
+        actions = np.asarray(actions, dtype=np.float64)
+        if len(actions) == self.num_envs and len(indices) != self.num_envs:
+            actions = actions[list(indices)]
+        assert actions.shape == (len(indices), len(self.zone_names)), \
+            'actions shape is {} and required is {}'.format(
+                actions.shape, (len(indices), len(self.zone_names)))
+
+        for index, action in zip(indices, actions.tolist()):
+            assert index not in self._pending, 'Worker {} is still stepping'.format(
+                index)
+            self._pipes[index].send(
+                ('step', dict(zip(self.zone_names, action))))
+            self._pending.add(index)
+
+    def step_wait(self, barrier=None, timeout=None):
+        """Waits for the pending workers.
+
+        Args:
+            barrier (int) : number of pending workers to wait for
+                (default: the env barrier, or all of them)
+            timeout (float) : maximum time to wait in seconds
+
+        Returns:
+            (observation, reward, done, info) of all the flights
+        """
+        barrier = barrier or self.barrier or len(self._pending)
+        barrier = min(barrier, len(self._pending))
+
+        infos = [{'Pending': True} if i in self._pending else {}
+                 for i in range(self.num_envs)]
+        replies = [('ok', None)] * self.num_envs
+        ready = 0
+        while ready < barrier:
+            pipes = [self._pipes[i] for i in self._pending]
+            done_pipes = wait(pipes, timeout=timeout)
+            if not done_pipes:
+                break
+            for pipe in done_pipes:
+                index = self._pipes.index(pipe)
+                replies[index] = pipe.recv()
+                infos[index] = replies[index][1]
+                self._pending.discard(index)
+                ready += 1
+
+        if any(status == 'error' for status, _ in replies):
+            # Collect the other workers so that none is left pending
+            for index in list(self._pending):
+                self._pipes[index].recv()
+            self._pending.clear()
+            self._raise_errors('step', replies)
+
+        return self.observation, self._shared['Rewards'], self._shared['Dones'], infos
+
+    def step(self, actions):
+        """To take a step in all the flights and wait for all of them.
+        Workers left pending by `step_wait` must be collected with
+        `step_wait` first, so that their rewards and done flags are not
+        overwritten by this step.
+        Check VectorSeatSmartEnv for more documentations
+        """
+        assert not self._pending, 'Workers {} are still stepping, call step_wait first'.format(
+            self.pending)
+        self.step_async(actions)
+        return self.step_wait(barrier=self.num_envs)
+
+    def reset(self):
+        """To reset all the flights.
+        Check ENV for more documentations
+        """
+        self._call('reset')
+        return self.observation
+
+    def seed(self, seed=None):
+        """To set the seed in the workers. Worker i is seeded with
+        the i-th child SeedSequence of the seed (see seeding.spawn).
+
+        Args:
+            seed (int/SeedSequence) : Random seed value for controlled experiments
+        """
+        if seed is not None:
+            self._call('seed', spawn(seed, self.num_envs))
+
+    def metrics(self):
+        """Phase timers and counters of the workers.
+
+        Returns:
+            list: GameMetrics of every worker (see GameMetrics.merge)
+        """
+        return self._call('metrics')
+
+    def export_trace(self, path):
+        """Writes the spans of all the workers into one Chrome trace
+        JSON file (see Tracer).
+
+        Returns:
+            str: path
+        """
+        return write_chrome_trace(path, self._call('trace'))
+
+    def close(self):
+        """To close the environment and stop the workers.
+        Check ENV for more documentations
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            # Workers may already be gone (e.g. at interpreter exit)
+            for index in list(self._pending):
+                try:
+                    self._pipes[index].recv()
+                except (EOFError, OSError):
+                    pass
+            self._pending.clear()
+            for pipe in self._pipes:
+                try:
+                    pipe.send(('close', None))
+                except OSError:
+                    pass
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+            for pipe in self._pipes:
+                pipe.close()
+        finally:
+            self._shared.close()
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
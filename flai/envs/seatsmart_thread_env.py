@@ -0,0 +1,67 @@
+from flai.envs.seatsmart_vector_env import VectorSeatSmartEnv
+from flai.envs.seatsmart.tracing import Tracer
+from concurrent.futures import ThreadPoolExecutor
+import logging
+logger = logging.getLogger('SeatSmart')
+
+
+class ThreadVectorSeatSmartEnv(VectorSeatSmartEnv):
+    """Thread pool backed vector SeatSmart environment. The games are
+    played by `num_threads` threads of one process, so they share the
+    memory and the configuration. Most of a game turn is Python code
+    that holds the GIL and the array kernels of one customer choice are
+    small, so the thread pool is not faster than a sequential run (it is
+    slightly slower, see benchmarks.determinism). Use it to overlap env
+    steps with work that releases the GIL, and SubprocVectorSeatSmartEnv
+    for a parallel speedup.
+
+    Every game owns its Generators (customer arrivals and seat choices,
+    see VectorSeatSmartEnv.seed) and every waiting customer picks a seat
+    with its own model instead of the batched one, so the results do not
+    depend on the thread scheduling and are the same as a sequential run
+    with the same seed (num_threads=0).
+
+    Actions, observations and auto-reset follow VectorSeatSmartEnv.
+
+    Example :
+        env = ThreadVectorSeatSmartEnv(num_envs=8, num_threads=4)
+        env.seed(7)
+        observation = env.reset()
+        observation, reward, done, info = env.step(env.sample_actions())
+        env.close()
+    """
+
+    def __init__(self,
+                 num_envs: int = 1,
+                 config_path: str = None,
+                 num_threads: int = None,
+                 validate: bool = True,
+                 tracer: Tracer = None):
+
+        super().__init__(num_envs=num_envs, config_path=config_path,
+                         validate=validate, tracer=tracer)
+        self.num_threads = num_threads
+        self._executor = None
+        if num_threads != 0:
+            self._executor = ThreadPoolExecutor(max_workers=num_threads,
+                                                thread_name_prefix='SeatSmart')
+
+    def _customer_actions(self):
+        """Every game asks its own customer (see PricingGame.transaction)"""
+        return [None] * self.num_envs
+
+    def _act(self, zone_prices, customer_actions):
+        """Plays one turn of every game in the thread pool."""
+        if self._executor is None:
+            return super()._act(zone_prices, customer_actions)
+        return list(self._executor.map(
+            lambda i: self.games[i].act(zone_prices[i], customer_actions[i]),
+            range(self.num_envs)))
+
+    def close(self):
+        """To close the environment and stop the threads.
+        Check ENV for more documentations
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
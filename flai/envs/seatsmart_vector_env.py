@@ -0,0 +1,298 @@
+from flai.envs.seatsmart_env import ActionSpace
+from flai.envs.seatsmart.game import PricingGame, GameTemplate
+from flai.envs.seatsmart.flight import PRODUCT_FIELDS
+from flai.envs.seatsmart.customer import SeatCustomer_MNL
+from flai.envs.seatsmart.models import customer
+from flai.envs.seatsmart.metrics import GameMetrics, clock
+from flai.envs.seatsmart.tracing import Tracer
+from flai.utils import seed_sequence, make_rng
+from flai import Env
+import numpy as np
+import yaml
+import logging
+logger = logging.getLogger('SeatSmart')
+
+
+def observation_shapes(seatmap, num_envs):
+    """Shapes and dtypes of the stacked observation arrays of
+    num_envs flights with the given seat map."""
+    return {
+        'Seats': ((num_envs, seatmap.MaxRows, seatmap.MaxCols), np.float32),
+        'Products': ((num_envs, len(seatmap.Zones), len(PRODUCT_FIELDS)), np.float32),
+        'TimeToDeparture': ((num_envs,), np.float32),
+    }
+
+
+def write_observation(game, index, observation):
+    """Writes the observation of a game into row `index` of the
+    stacked observation arrays (see observation_shapes)."""
+    observation['Seats'][index] = game.flight.seat_prices()
+
+    game.flight.write_products(observation['Products'][index])
+
+    if game.game_over:
+        observation['TimeToDeparture'][index] = 0
+    else:
+        observation['TimeToDeparture'][index] = (
+            game.CONFIG.ClockState.StopUTC - game.event_creator.spawned_time).total_seconds()
+
+
+class VectorSeatSmartEnv(Env):
+    """Vectorized SeatSmart environment. It holds `num_envs` independent
+    SeatSmart games (one flight each) that are stepped in lockstep, so an
+    agent can price many flights with one call instead of one Python
+    level `step` per flight.
+
+    Actions are a (num_envs, n_zones) price array where the columns
+    follow the zone order of the seat map (see `zone_names`). Observations
+    are a dict of stacked arrays:
+
+        Seats: (num_envs, rows, cols) float32, seat price if the seat is
+            available, -1 for ghost seats and 0 otherwise
+        Products: (num_envs, n_zones, 6) float32, per zone
+            [Sold, Available, Revenue, Price, MinPrice, MaxPrice]
+        TimeToDeparture: (num_envs,) float32, seconds left until departure
+
+    The flights are not stacked state: every flight keeps its own
+    PricingGame and is still played with one Python level
+    PricingGame.act per step (see `_act`). What is batched are the seat
+    choices of the waiting single seat customers of all the flights,
+    made together with SeatCustomer_MNL.batch_action, and the stacked
+    observation arrays, written in place.
+
+    `validate=False` skips the validation of the per step models (see
+    PricingGame).
+
+    `metrics` merges the phase timers and counters of the flights
+    (each flight updates its own GameMetrics in `flight_metrics`) with
+    the ones of the env (steps, batched customer actions and stacked
+    observations). With a `tracer` (see Tracer), the timed phases of the
+    env and of the flights are recorded as spans.
+
+    Finished episodes are reset automatically. The returned observation of
+    a finished flight is therefore the first observation of its new
+    episode and the finished episode score is reported in `info`.
+
+    Example :
+        env = VectorSeatSmartEnv(num_envs=8)
+        observation = env.reset()
+        observation, reward, done, info = env.step(env.sample_actions())
+    """
+
+    PRODUCT_FIELDS = PRODUCT_FIELDS
+
+    def __init__(self,
+                 num_envs: int = 1,
+                 config_path: str = None,
+                 validate: bool = True,
+                 tracer: Tracer = None):
+
+        assert num_envs > 0, 'num_envs should be positive but it is {}'.format(
+            num_envs)
+        self.num_envs = num_envs
+        self.validate = validate
+
+        self.config = {}
+        if not config_path is None:
+            with open(config_path) as f:
+                self.config = yaml.load(f, Loader=yaml.FullLoader)
+            logger.debug('Loading configuration: %s', self.config)
+        self.template = GameTemplate(self.config)
+
+        self.games = [None] * num_envs
+        self.env_metrics = GameMetrics(tracer=tracer)
+        self.flight_metrics = [GameMetrics(tracer=tracer) for _ in range(num_envs)]
+        self.seed_sequence = None
+        self.seed()
+        self._scores = np.zeros(num_envs, dtype=np.float64)
+        self._episode_lengths = np.zeros(num_envs, dtype=np.int64)
+
+    def _allocate(self, game):
+        """Allocates the stacked observation buffers from the shape
+        of the first game."""
+        seatmap = game.CONFIG.SeatMap
+        self.zone_names = [zone.Name for zone in seatmap.Zones]
+        self._observation = {key: np.zeros(shape, dtype=dtype) for key, (shape, dtype)
+                             in observation_shapes(seatmap, self.num_envs).items()}
+
+    def _write_observation(self, index):
+        """Writes the observation of game `index` into row `index` of
+        the stacked observation buffers."""
+        start = clock()
+        write_observation(self.games[index], index, self._observation)
+        self.flight_metrics[index].add('analyst_observation', clock() - start)
+
+    @property
+    def metrics(self):
+        """GameMetrics of the env and of all the flights (merged copy)"""
+        return GameMetrics.merge([self.env_metrics] + self.flight_metrics)
+
+    @property
+    def observation(self):
+        """Stacked observation of all the games"""
+        return self._observation
+
+    @property
+    def observation_space(self):
+        """Observation Space variable to extend ENV
+
+        Returns: shapes of the stacked observation arrays
+        """
+        return {key: value.shape for key, value in self.observation.items()}
+
+    @property
+    def action_space(self):
+        """Action Space Varirable to extend ENV
+
+        Returns: ActionSpace object of a single flight.
+        """
+        return ActionSpace(self.games[0].flight.zone_price, rng=self.rng)
+
+    def sample_actions(self):
+        """Sample a (num_envs, n_zones) price array, one row per flight."""
+        zone_price = self.games[0].flight.zone_price
+        actions = np.zeros((self.num_envs, len(self.zone_names)))
+        for z, key in enumerate(self.zone_names):
+            actions[:, z] = self.rng.integers(low=zone_price[key]['MinPrice'],
+                                              high=zone_price[key]['MaxPrice'],
+                                              size=self.num_envs)
+        return actions
+
+    def render(self, mode='human'):
+        """Renders the environment. Check ENV for
+        more documentations.
+        """
+        pass
+
+    def _reset_game(self, index):
+        self.games[index] = PricingGame(
+            seed=self._game_seeds[index].spawn(1)[0], validate=self.validate,
+            metrics=self.flight_metrics[index], template=self.template)
+        self.flight_metrics[index].count('episodes')
+        self._scores[index] = 0
+        self._episode_lengths[index] = 0
+
+    def step(self, actions):
+        """To take a step in all the games.
+
+        Args:
+            actions (np.array) : (num_envs, n_zones) zone prices
+
+        Returns:
+            (observation, reward, done, info) where reward and done are
+            (num_envs,) arrays and info is a list of dicts
+        """
+        start = clock()
+        actions = np.asarray(actions, dtype=np.float64)
+        assert actions.shape == (self.num_envs, len(self.zone_names)), \
+            'actions shape is {} and required is {}'.format(
+                actions.shape, (self.num_envs, len(self.zone_names)))
+
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        infos = [{} for _ in range(self.num_envs)]
+
+        zone_prices = [dict(zip(self.zone_names, row))
+                       for row in actions.tolist()]
+        for i, game in enumerate(self.games):
+            if not game.game_over:
+                game.flight.zone_price = zone_prices[i]
+        customer_actions = self._customer_actions()
+        results = self._act(zone_prices, customer_actions)
+
+        for i, (done, rev) in enumerate(results):
+            rewards[i] = rev
+            dones[i] = done
+            self._scores[i] += rev
+            self._episode_lengths[i] += 1
+
+            if done:
+                infos[i]['Score'] = self._scores[i]
+                infos[i]['EpisodeLength'] = int(self._episode_lengths[i])
+                self._reset_game(i)
+
+            self._write_observation(i)
+
+        self.env_metrics.count('steps', self.num_envs)
+        self.env_metrics.add('step', clock() - start)
+        return self.observation, rewards, dones, infos
+
+    def _act(self, zone_prices, customer_actions):
+        """Plays one turn of every game.
+
+        Returns:
+            list: (game over, seat revenue) of every game
+        """
+        return [game.act(zone_prices[i], customer_actions[i])
+                for i, game in enumerate(self.games)]
+
+    def _customer_actions(self):
+        """Seat selection of the waiting customers of all the games
+        in one batch. The choice noise of every customer is drawn from
+        the Generator of its own game. Games without a waiting single
+        seat customer get None (the game asks its own customer)."""
+        customer_actions = [None] * self.num_envs
+        waiting = [i for i, game in enumerate(self.games)
+                   if game.customer_waiting and game.customer_context.GroupSize == 1]
+        if not waiting:
+            return customer_actions
+
+        start = clock()
+        seatmap = self.games[waiting[0]].flight.state.SeatMap
+        seats = np.stack([self.games[i].flight.seat_prices() for i in waiting])
+        types = [self.games[i].seat_customer.customer.Name for i in waiting]
+        rngs = [self.games[i].seat_customer.rng for i in waiting]
+        selected = self.seat_customer.batch_action(seats, types,
+                                                   seatmap.WindowCols,
+                                                   seatmap.AisleCols,
+                                                   seatmap.ExitRows,
+                                                   rngs=rngs)
+        self.env_metrics.add('customer_action', clock() - start)
+
+        make_action = customer.Action if self.validate else customer.Action.construct
+        for i, (row, col) in zip(waiting, selected.tolist()):
+            customer_actions[i] = make_action(
+                Selected=[(row, col)] if row >= 0 else [])
+        return customer_actions
+
+    def reset(self):
+        """To reset all the games.
+        Check ENV for more documentations
+        """
+        start = clock()
+        for i in range(self.num_envs):
+            self._reset_game(i)
+            if i == 0:
+                self._allocate(self.games[0])
+            self._write_observation(i)
+
+        self.env_metrics.add('reset', clock() - start)
+        return self.observation
+
+    def seed(self, seed=None):
+        """To set the seed of the environment. Every flight gets its
+        own child SeedSequence, from which the seed of each of its games
+        is spawned. The batched customer choices draw their noise from
+        the Generator of the seat customer of each game, so the games of
+        a flight do not depend on the other flights (nor on num_envs).
+        The sampled actions draw from the env Generator. The seed applies
+        from the next reset.
+
+        Args:
+            seed (int/SeedSequence) : Random seed value for controlled
+                experiments. A fresh OS entropy seed is used the first
+                time if it is None.
+        """
+        if (seed is None) and (self.seed_sequence is not None):
+            return
+        self.seed_sequence = seed_sequence(seed)
+        action_seed, customer_seed = self.seed_sequence.spawn(2)
+        self._game_seeds = self.seed_sequence.spawn(self.num_envs)
+        self.rng = make_rng(action_seed)
+        self.seat_customer = SeatCustomer_MNL(rng=make_rng(customer_seed))
+
+    def close(self):
+        """To close the environment.
+        Check ENV for more documentations
+        """
+        pass
@@ -674,7 +674,7 @@ class Game(object):
         if (self.seat_map.ticket_availability >= groupsize)\
                 and (self.game_episode.status):
             # First Sell a Ticket to the group
-            ticket_price = np_random.rng.randint(500, 1000)
+            ticket_price = np_random.rng.integers(500, 1000)
             for _ in range(groupsize):
                 self.seat_map.sell_ticket(ticket_price)
 
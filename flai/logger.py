@@ -1,8 +1,121 @@
-from rich.traceback import install
 from rich.console import Console
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import datetime
+import logging
+import queue
 
 # Creating a console for flai
 console = Console()
 
-# Error handeling by rich module
-install(console=console, show_locals=False)
+
+def install_traceback(show_locals=False):
+    """Opt-in error handeling by the rich module (pretty tracebacks
+    for uncaught exceptions on the flai console)."""
+    from rich.traceback import install
+    return install(console=console, show_locals=show_locals)
+
+
+# Arguments that cannot change after the logging call
+IMMUTABLE_ARGS = (str, bytes, int, float, complex, bool, type(None),
+                  datetime.date, datetime.time, datetime.timedelta)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller. Records are dropped
+    when the queue is full, `dropped` counts them.
+
+    Records whose arguments are all immutable scalars are queued as
+    they are and formatted by the listener thread. The message of the
+    other records (e.g. a zone price dict) is formatted when it is
+    queued, so it shows the state at the logging call and not the state
+    of a later step.
+
+    Args:
+        queue (queue.Queue) : bounded queue shared with a QueueListener
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(value, IMMUTABLE_ARGS) for value in values):
+                record.msg = record.getMessage()
+                record.args = None
+        # The rest of the formatting is left to the handlers of the listener
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+
+    def enqueue_sentinel(self):
+        # Waits for room instead of failing on a full queue
+        self.queue.put(self._sentinel)
+
+
+class AsyncLogging:
+    """Moves the handlers of a logger (e.g. the Rich console handler of
+    the SeatSmart logger) behind a bounded queue. The logger only
+    enqueues records and a QueueListener thread formats and renders
+    them, so log volume cannot stall the simulation: records are dropped
+    when `maxsize` records are already waiting.
+
+    Args:
+        name (str) : logger name
+        maxsize (int) : maximum number of waiting records
+
+    Example :
+        sink = AsyncLogging('SeatSmart').start()
+        ...
+        sink.stop()
+    """
+
+    def __init__(self, name='SeatSmart', maxsize=10000):
+        self.logger = logging.getLogger(name)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handlers = []
+        self.listener = None
+
+    @property
+    def dropped(self):
+        """Number of records dropped because the queue was full"""
+        return self.handler.dropped
+
+    def start(self):
+        """Detaches the handlers of the logger and serves them from
+        the listener thread."""
+        if self.listener is not None:
+            return self
+        self.handlers = [handler for handler in self.logger.handlers
+                         if handler is not self.handler]
+        for handler in self.handlers:
+            self.logger.removeHandler(handler)
+        self.logger.addHandler(self.handler)
+        self.listener = _Listener(self.queue, *self.handlers,
+                                  respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Flushes the waiting records and attaches the handlers to the
+        logger again."""
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+        self.logger.removeHandler(self.handler)
+        for handler in self.handlers:
+            self.logger.addHandler(handler)
+        atexit.unregister(self.stop)
@@ -1,2 +1,3 @@
 from .colorize import colorize
-from .seeding import np_random
\ No newline at end of file
+from .seeding import np_random, seed_sequence, make_rng, spawn
+from .profiling import EpisodeProfiler, merge_stats, seed_label
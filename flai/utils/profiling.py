@@ -0,0 +1,118 @@
+import cProfile
+import glob
+import os
+import pstats
+
+
+def seed_label(seed_sequence):
+    """File name friendly label of a SeedSequence: its entropy followed
+    by its spawn key (e.g. 7-0-3 for the 4th child of the 1st child of
+    seed 7)."""
+    return '-'.join(str(part) for part in
+                    (seed_sequence.entropy,) + tuple(seed_sequence.spawn_key))
+
+
+class EpisodeProfiler:
+    """Profiles every `every`-th episode (episodes 0, every, 2 * every,
+    ...) with cProfile and writes one
+    `{prefix}_seed{seed}_episode{episode}.pstats` file per profiled
+    episode into `directory`. The files can be opened with snakeviz or
+    merged with merge_stats.
+
+    Args:
+        every (int) : profiling period in episodes
+        directory (str) : output directory (created if needed)
+        prefix (str) : file name prefix
+
+    cProfile only sees the thread that enabled it. When the episode is
+    played from other threads (e.g. the executor threads of
+    SeatSmartEnv.async_step), wrap every call with `pause` and `resume`
+    on the calling thread so that only the episode work is recorded.
+    From Python 3.12 cProfile records all the threads while it is
+    enabled, so other work running in the meantime is recorded too.
+
+    >> profiler = EpisodeProfiler(every=10, directory='profiles')
+    >> profiler.start(episode, seed_label(seed_sequence))
+    >> ...
+    >> profiler.stop()
+    """
+
+    def __init__(self, every, directory='profiles', prefix='seatsmart'):
+        assert every > 0, 'every should be positive but it is {}'.format(every)
+        self.every = every
+        self.directory = directory
+        self.prefix = prefix
+        self.paths = []
+        self._profile = None
+        self._path = None
+
+    @property
+    def active(self):
+        """True while an episode is profiled"""
+        return self._profile is not None
+
+    def start(self, episode, seed):
+        """Starts profiling if `episode` is a profiled episode. A running
+        profile is written first.
+
+        Args:
+            episode (int) : episode number
+            seed (str) : seed label of the file name (see seed_label)
+        """
+        self.stop()
+        if episode % self.every:
+            return
+        self._path = os.path.join(self.directory, '{}_seed{}_episode{}.pstats'.format(
+            self.prefix, seed, episode))
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def resume(self):
+        """Enables the running profile on the calling thread"""
+        if self._profile is not None:
+            self._profile.enable()
+
+    def pause(self):
+        """Disables the running profile on the calling thread"""
+        if self._profile is not None:
+            self._profile.disable()
+
+    def stop(self):
+        """Stops the running profile and writes it.
+
+        Returns:
+            str: path of the written file, None if nothing was profiled
+        """
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        self._profile.dump_stats(self._path)
+        self.paths.append(self._path)
+        path, self._profile, self._path = self._path, None, None
+        return path
+
+
+def merge_stats(paths, output=None):
+    """Merges .pstats files, e.g. the profiles written by the workers of
+    a vector run.
+
+    Args:
+        paths (str/list) : directory of .pstats files or list of files
+        output (str) : file to write the merged stats to (optional)
+
+    Returns:
+        pstats.Stats: merged stats
+
+    Example :
+        merge_stats('profiles', output='merged.pstats').sort_stats('cumtime').print_stats(20)
+    """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(os.path.join(paths, '*.pstats')))
+    assert paths, 'No .pstats files to merge'
+    stats = pstats.Stats(paths[0])
+    for path in paths[1:]:
+        stats.add(path)
+    if output is not None:
+        stats.dump_stats(output)
+    return stats
@@ -1,5 +1,51 @@
 import numpy as np
 
+
+def seed_sequence(seed=None):
+    """SeedSequence from a seed.
+
+    Args:
+        seed (int/list/SeedSequence) : seed, None for fresh OS entropy.
+            A SeedSequence is returned as is.
+
+    Returns:
+        np.random.SeedSequence
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def make_rng(seed=None):
+    """PCG64 Generator derived from a seed (see seed_sequence).
+    A Generator is returned as is."""
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.Generator(np.random.PCG64(seed_sequence(seed)))
+
+
+def spawn(seed, n):
+    """n independent child SeedSequences of a seed, e.g. one per
+    worker or per environment of a vector env.
+
+    Args:
+        seed (int/list/SeedSequence) : parent seed
+        n (int) : number of children
+
+    Returns:
+        list: np.random.SeedSequence children
+    """
+    return seed_sequence(seed).spawn(n)
+
+
 class np_random:
-    
-    rng = np.random.RandomState()
\ No newline at end of file
+    """Process wide Generator, used only by the code that is not given
+    a Generator of its own."""
+
+    rng = make_rng()
+
+    @classmethod
+    def seed(cls, seed=None):
+        """Reseeds the process wide Generator in place, so the objects
+        that hold a reference to it draw from the new seed too."""
+        cls.rng.bit_generator.state = np.random.PCG64(seed_sequence(seed)).state
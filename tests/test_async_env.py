@@ -0,0 +1,79 @@
+import asyncio
+import pstats
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flai.envs.seatsmart_async_env import AsyncVectorSeatSmartEnv
+from flai.envs.seatsmart_env import SeatSmartEnv
+
+NUM_ENVS = 4
+STEPS = 800
+MAX_IN_FLIGHT = 2
+
+
+class Concurrency:
+    """Largest number of wrapped calls running at the same time"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def wrap(self, func):
+        def wrapped(*args, **kwargs):
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            try:
+                time.sleep(0.002)
+                return func(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+        return wrapped
+
+
+def test_max_in_flight_bounds_steps_and_resets():
+    executor = ThreadPoolExecutor(max_workers=NUM_ENVS)
+    env = AsyncVectorSeatSmartEnv(num_envs=NUM_ENVS, max_in_flight=MAX_IN_FLIGHT,
+                                  executor=executor)
+    env.seed(5)
+    concurrency = Concurrency()
+    for flight in env.envs:
+        flight.reset = concurrency.wrap(flight.reset)
+        flight.step = concurrency.wrap(flight.step)
+
+    async def main():
+        await env.reset()
+        assert concurrency.peak <= MAX_IN_FLIGHT
+        # Episodes end during the run, so flights reset while others step
+        policy = lambda index, observation: {'StandardSeat': 1}
+        return [transition async for transition in env.run(policy, steps=STEPS)]
+
+    transitions = asyncio.run(main())
+    executor.shutdown()
+    assert len(transitions) == STEPS
+    assert any(done for _, _, _, done, _ in transitions)
+    assert 1 < concurrency.peak <= MAX_IN_FLIGHT
+
+
+def test_async_steps_are_profiled(tmp_path):
+    executor = ThreadPoolExecutor(max_workers=4)
+    env = SeatSmartEnv(profile_every=1, profile_dir=str(tmp_path))
+    env.seed(1)
+
+    async def episode():
+        await env.async_reset(executor)
+        steps = 1
+        while not (await env.async_step({'StandardSeat': 12}, executor))[2]:
+            steps += 1
+        return steps
+
+    steps = asyncio.run(episode())
+    executor.shutdown()
+    assert len(env.profiler.paths) == 1
+    calls = {key[2]: value[1]
+             for key, value in pstats.Stats(env.profiler.paths[0]).stats.items()}
+    assert calls['step'] == steps
+    assert calls['act'] == steps
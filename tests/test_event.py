@@ -0,0 +1,83 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from flai.envs.seatsmart.event import NHPP_Thinning
+from flai.envs.seatsmart.game import PricingGame
+from flai.utils import make_rng
+
+
+def play(game, price=25):
+    """Plays a game to the end, returns the times of the arrivals"""
+    arrivals = []
+    while not game.game_over:
+        arrivals.append(game.event_creator.spawned_time)
+        game.act({'StandardSeat': price})
+    return arrivals
+
+
+def test_price_review_is_handled():
+    game = PricingGame(seed=3)
+    clock = game.event_state.Clock
+    creator = game.event_creator
+    arrivals, reviews = [], []
+
+    def price_review(time):
+        reviews.append((time, len(arrivals)))
+
+    creator.register('PriceReview', price_review)
+    middle = clock.StartUTC + (clock.StopUTC - clock.StartUTC) / 2
+    creator.schedule(middle, 'PriceReview')
+    creator.schedule(clock.StopUTC + datetime.timedelta(days=1), 'PriceReview')
+    while not game.game_over:
+        arrivals.append(game.event_creator.spawned_time)
+        game.act({'StandardSeat': 25})
+
+    # Only the review before departure is handled, in time order
+    assert len(reviews) == 1
+    time, n = reviews[0]
+    assert time == middle
+    assert 0 < n < len(arrivals)
+    assert all(arrival <= middle for arrival in arrivals[:n])
+    assert all(arrival >= middle for arrival in arrivals[n:])
+
+
+def test_arrivals_are_unchanged_by_other_events():
+    games = [PricingGame(seed=3), PricingGame(seed=3)]
+    clock = games[1].event_state.Clock
+    games[1].event_creator.register('PriceReview', lambda time: None)
+    games[1].event_creator.schedule(clock.StartUTC + (clock.StopUTC - clock.StartUTC) / 3,
+                                    'PriceReview')
+    assert play(games[0]) == play(games[1])
+
+
+def test_schedule_rejects_unknown_events():
+    creator = PricingGame(seed=3).event_creator
+    clock = creator.state.Clock
+    with pytest.raises(ValueError, match='Unknown event'):
+        creator.schedule(clock.StartUTC, 'Cancellation')
+    with pytest.raises(ValueError, match='customer type'):
+        creator.register(creator.state.CustomerTypes[0].Name, lambda time: None)
+
+
+def bimodal(x):
+    """Booking curve with two peaks, integrating to about 0.18"""
+    return np.exp(-((x - 0.3) / 0.05)**2) + np.exp(-((x - 0.7) / 0.05)**2)
+
+
+@pytest.mark.parametrize('scale', [1e-2, 1, 1e4])
+def test_custom_intensity_is_normalized(scale):
+    times = np.array(NHPP_Thinning(N=1000, intensity=lambda x: scale * bimodal(x),
+                                   rng=make_rng(0)).sample())
+    expected = np.array(NHPP_Thinning(N=1000, intensity=bimodal, rng=make_rng(0)).sample())
+
+    np.testing.assert_allclose(times, expected)
+    # Arrivals follow the curve over the booking window
+    assert np.count_nonzero(times > 0.95) < 50
+    assert np.count_nonzero(times < 0.5) == pytest.approx(500, abs=60)
+
+
+def test_zero_intensity_is_rejected():
+    with pytest.raises(ValueError, match='positive integral'):
+        NHPP_Thinning(N=10, intensity=np.zeros_like)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from flai.envs.seatsmart.features import SeatFeatures, edge_distance, scan_groupseats
+
+SIZES = (1, 2, 3, 4)
+
+
+def initial_availability(rng, rows, cols):
+    """Seat map with a few unavailable (ghost or blocked) seats"""
+    return rng.random((rows, cols)) > 0.05
+
+
+def check_features(features, available):
+    """Compares the incremental features against a fresh SeatFeatures
+    and against the full recompute functions"""
+    img = available.astype(np.float64)
+    fresh = SeatFeatures(available)
+    distance, has_contour = edge_distance(img)
+
+    isolation = features.isolation()
+    assert np.array_equal(isolation, fresh.isolation())
+    assert np.array_equal(features._distance, distance)
+    assert features._has_contour == has_contour
+    for size in SIZES:
+        group_seats = features.group_seats(size)
+        assert np.array_equal(group_seats, fresh.group_seats(size))
+        assert np.array_equal(group_seats, scan_groupseats(img, size))
+
+
+@pytest.mark.parametrize('shape', [(30, 6), (12, 10), (5, 3)])
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_features_match_recompute(shape, seed):
+    rng = np.random.default_rng(seed)
+    available = initial_availability(rng, *shape)
+    features = SeatFeatures(available)
+    for size in SIZES:
+        features.group_seats(size)  # cache the masks of the sizes
+
+    while available.any():
+        seats = np.argwhere(available)
+        # Mostly one sale between two reads, sometimes a few (lazy updates)
+        sales = 1 if rng.random() < 0.8 else min(len(seats), 3)
+        for index in rng.choice(len(seats), size=sales, replace=False):
+            row, col = seats[index].tolist()
+            features.sell(row, col)
+            available[row, col] = False
+        check_features(features, available)
+        if rng.random() < 0.1:
+            features = features.copy()
+    check_features(features, available)
+
+
+def test_debug_mode_checks_reads():
+    rng = np.random.default_rng(0)
+    available = initial_availability(rng, 10, 6)
+    features = SeatFeatures(available, debug=True)
+    features.sell(4, 2)
+    features.isolation(), features.group_seats(2)
+
+    # A corrupted cache is detected
+    features._distance[0, 0] += 1
+    features.sell(5, 3)
+    with pytest.raises(AssertionError, match='full recompute'):
+        features.isolation()
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from flai.envs.seatsmart.flight import Flight
+from flai.envs.seatsmart.game import PricingGame
+from flai.envs.seatsmart.models.flight import FlightBaseState, FlightInfo, SeatMap
+
+# Overlapping zones: the exit and premium zones overlap the upfront zone
+# and the last matching zone wins, rows 8-11 are left to the first zone.
+SEATMAP = {
+    'MaxRows': 12,
+    'MaxCols': 6,
+    'Zones': [
+        {'Name': 'StandardSeat',
+         'PriceRule': {'Price': 10, 'MinPrice': 0, 'MaxPrice': 15}},
+        {'Name': 'UpfrontSeat', 'IncludeRows': [0, 1, 2, 3, 4],
+         'PriceRule': {'Price': 15, 'MinPrice': 10, 'MaxPrice': 25}},
+        {'Name': 'ExitSeat', 'IncludeRows': [4, 7], 'ExcludeCols': [0],
+         'PriceRule': {'Price': 25, 'MinPrice': 20, 'MaxPrice': 40}},
+        {'Name': 'PremiumSeat', 'IncludeRows': [0, 1], 'ExcludeSeats': [(0, 2), (1, 5)],
+         'PriceRule': {'Price': 30, 'MinPrice': 25, 'MaxPrice': 50}},
+    ],
+    'Blocked': {'Seats': [(5, 5), (0, 0)]},
+    'Ghost': {'Seats': [(11, 0), (11, 5)]},
+}
+
+
+def zone_of(seatmap, row, col):
+    """Zone name of a seat, the last matching zone wins"""
+    name = seatmap.Zones[0].Name
+    for zone in seatmap.Zones:
+        if row in zone.IncludeRows and col not in zone.ExcludeCols and \
+                (row, col) not in [tuple(seat) for seat in zone.ExcludeSeats]:
+            name = zone.Name
+    return name
+
+
+def rescan(flight):
+    """Available seats per zone from a full scan of the seat grid"""
+    seatmap = flight.state.SeatMap
+    grid = flight.grid
+    available = {zone.Name: 0 for zone in seatmap.Zones}
+    for row in range(seatmap.MaxRows):
+        for col in range(seatmap.MaxCols):
+            if grid.available[row, col] and not grid.blocked[row, col] and \
+                    not grid.ghost[row, col]:
+                available[zone_of(seatmap, row, col)] += 1
+    return available
+
+
+def check_ledger(flight, base, revenue):
+    available = rescan(flight)
+    sold = {key: base[key] - value for key, value in available.items()}
+    assert flight.availability == available
+    assert flight.sold == sold
+    assert flight.zone_revenue == revenue
+    for product in flight():
+        assert product['Available'] == available[product['Name']]
+        assert product['Sold'] == sold[product['Name']]
+        assert product['Revenue'] == revenue[product['Name']]
+
+    products = flight.write_products(np.zeros((len(available), 6)))
+    np.testing.assert_array_equal(products[:, 0], list(sold.values()))
+    np.testing.assert_array_equal(products[:, 1], list(available.values()))
+
+
+@pytest.mark.parametrize('validate', [True, False])
+@pytest.mark.parametrize('seed', range(3))
+def test_ledger_matches_rescan(seed, validate):
+    rng = np.random.default_rng(seed)
+    flight = Flight(FlightBaseState(SeatMap=SeatMap(**SEATMAP), FlightInfo=FlightInfo()),
+                    validate=validate)
+    base = rescan(flight)
+    revenue = {key: 0 for key in base}
+    check_ledger(flight, base, revenue)
+
+    for _ in range(200):
+        operation = rng.choice(['sell', 'sell', 'price', 'copy'])
+        if operation == 'sell':
+            seats = np.argwhere(flight.grid.available)
+            if not len(seats):
+                break
+            row, col = seats[rng.integers(len(seats))].tolist()
+            zone = zone_of(flight.state.SeatMap, row, col)
+            price = flight.zone_price[zone]['Price']
+            assert flight.sell_seat(row, col) == price
+            revenue[zone] += price
+        elif operation == 'price':
+            flight.zone_price = {key: float(rng.integers(value['MinPrice'], value['MaxPrice'] + 1))
+                                 for key, value in flight.zone_price.items()
+                                 if rng.random() < 0.5}
+        else:
+            original, snapshot = flight, flight()
+            flight = flight.copy()
+            # Later changes of the copy do not leak into the original
+            flight.zone_price = {key: value['MinPrice']
+                                 for key, value in flight.zone_price.items()}
+            seats = np.argwhere(flight.grid.available)
+            if len(seats):
+                row, col = seats[0].tolist()
+                zone = zone_of(flight.state.SeatMap, row, col)
+                revenue[zone] += flight.sell_seat(row, col)
+            assert original() == snapshot
+        check_ledger(flight, base, revenue)
+
+
+def test_ledger_matches_rescan_in_games():
+    config = {'SeatMap': SEATMAP}
+    for seed in range(3):
+        rng = np.random.default_rng(seed)
+        game = PricingGame(config=config, seed=seed)
+        base = rescan(game.flight)
+        total = 0
+        while not game.game_over:
+            action = {key: float(rng.integers(value['MinPrice'], value['MaxPrice'] + 1))
+                      for key, value in game.flight.zone_price.items()}
+            total += game.act(action)[1]
+
+            available = rescan(game.flight)
+            assert game.flight.availability == available
+            assert game.flight.sold == {key: base[key] - value
+                                        for key, value in available.items()}
+            assert sum(game.flight.zone_revenue.values()) == pytest.approx(total)
@@ -0,0 +1,41 @@
+import logging
+import threading
+
+from flai.logger import AsyncLogging
+
+
+class Collect(logging.Handler):
+    """Keeps the formatted messages, the first one waits for `gate`"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.messages = []
+
+    def emit(self, record):
+        self.gate.wait(timeout=5)
+        self.messages.append(self.format(record))
+
+
+def test_queued_messages_show_the_state_at_the_call():
+    logger = logging.getLogger('flai.test_logger')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = Collect()
+    logger.addHandler(handler)
+    sink = AsyncLogging(logger.name).start()
+    try:
+        # The listener is held by the first record while the others wait
+        logger.info('first')
+        prices = {'StandardSeat': {'Price': 10}}
+        logger.info('Zone prices: %s', prices)
+        logger.info('Tickets: %s, revenue: %s', 3, 12.5)
+        prices['StandardSeat']['Price'] = 99
+        handler.gate.set()
+    finally:
+        sink.stop()
+        logger.removeHandler(handler)
+
+    assert handler.messages == ['first',
+                                "Zone prices: {'StandardSeat': {'Price': 10}}",
+                                'Tickets: 3, revenue: 12.5']
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from flai.envs.seatsmart_subproc_env import SubprocVectorSeatSmartEnv
+
+NUM_ENVS = 4
+PRICE = 25.
+
+
+@pytest.fixture
+def env():
+    env = SubprocVectorSeatSmartEnv(num_envs=NUM_ENVS)
+    env.seed(7)
+    env.reset()
+    yield env
+    env.close()
+
+
+def prices(env, price=PRICE):
+    return np.full((env.num_envs, len(env.zone_names)), price)
+
+
+def test_worker_error_is_raised(env):
+    actions = prices(env)
+    actions[2] = 1e6  # above MaxPrice
+    with pytest.raises(RuntimeError, match='Worker 2 failed'):
+        env.step(actions)
+    assert env.pending == []
+
+    # The workers are still serving commands
+    observation, reward, done, info = env.step(prices(env))
+    assert reward.shape == (NUM_ENVS, )
+
+
+def test_step_keeps_pending_rewards(env):
+    reference = SubprocVectorSeatSmartEnv(num_envs=NUM_ENVS)
+    reference.seed(7)
+    reference.reset()
+    _, expected, expected_done, _ = reference.step(prices(reference, 12.))
+    expected, expected_done = expected.copy(), expected_done.copy()
+    reference.close()
+
+    env.step_async(prices(env, 12.)[:2], indices=[0, 1])
+    assert env.pending == [0, 1]
+    with pytest.raises(AssertionError, match='still stepping'):
+        env.step(prices(env))
+
+    # The rows of the pending workers were not overwritten
+    _, reward, done, info = env.step_wait()
+    assert env.pending == []
+    np.testing.assert_array_equal(reward[:2], expected[:2])
+    np.testing.assert_array_equal(done[:2], expected_done[:2])
+    assert info[2:] == [{}, {}]
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from flai.envs.seatsmart_thread_env import ThreadVectorSeatSmartEnv
+
+NUM_ENVS = 3
+STEPS = 60
+SEED = 7
+
+
+def rollout(num_threads):
+    env = ThreadVectorSeatSmartEnv(num_envs=NUM_ENVS, num_threads=num_threads)
+    env.seed(SEED)
+    trace = [{key: value.copy() for key, value in env.reset().items()}]
+    for _ in range(STEPS):
+        observation, reward, done, info = env.step(env.sample_actions())
+        trace.append(({key: value.copy() for key, value in observation.items()},
+                      reward.copy(), done.copy(), info))
+    env.close()
+    return trace
+
+
+@pytest.fixture(scope='module')
+def sequential():
+    return rollout(num_threads=0)
+
+
+@pytest.mark.parametrize('num_threads', [1, 2, 4])
+def test_thread_pool_matches_sequential(sequential, num_threads):
+    trace = rollout(num_threads)
+    assert len(trace) == len(sequential)
+
+    for key, value in sequential[0].items():
+        np.testing.assert_array_equal(trace[0][key], value)
+
+    for step, (expected, actual) in enumerate(zip(sequential[1:], trace[1:])):
+        for key, value in expected[0].items():
+            np.testing.assert_array_equal(actual[0][key], value,
+                                          err_msg='{} at step {}'.format(key, step))
+        np.testing.assert_array_equal(actual[1], expected[1])
+        np.testing.assert_array_equal(actual[2], expected[2])
+        assert actual[3] == expected[3]
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from flai.envs.seatsmart_vector_env import VectorSeatSmartEnv
+
+STEPS = 200
+SEED = 11
+
+
+def first_flight(num_envs):
+    """Observations, rewards and dones of flight 0 with the same prices
+    for every flight"""
+    env = VectorSeatSmartEnv(num_envs=num_envs)
+    env.seed(SEED)
+    observation = env.reset()
+    prices = np.random.default_rng(0).integers(5, 30, size=STEPS)
+    trace = [observation['Seats'][0].copy()]
+    for price in prices:
+        observation, reward, done, _ = env.step(
+            np.full((num_envs, len(env.zone_names)), price))
+        trace.append((observation['Seats'][0].copy(), reward[0], done[0]))
+    return trace
+
+
+@pytest.mark.parametrize('num_envs', [2, 3, 5])
+def test_flight_is_invariant_to_num_envs(num_envs):
+    expected = first_flight(1)
+    trace = first_flight(num_envs)
+
+    np.testing.assert_array_equal(trace[0], expected[0])
+    for step, (actual, wanted) in enumerate(zip(trace[1:], expected[1:])):
+        np.testing.assert_array_equal(actual[0], wanted[0], err_msg='step {}'.format(step))
+        assert actual[1:] == wanted[1:], 'step {}'.format(step)